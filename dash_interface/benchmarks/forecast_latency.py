@@ -0,0 +1,100 @@
+# benchmarks/forecast_latency.py
+#
+# per-request latency of the price forecast view as the number of routes grows.
+# models are trained up front (as at load time) on a synthetic quarterly cube,
+# then generate_price_forecast_plot() is timed for random routes.
+#
+#   cd dash_interface && PYTHONPATH=. python benchmarks/forecast_latency.py [--routes 100 1000 10000]
+
+import gc
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from src import aggregates, data_loader, forecast
+
+DEFAULT_ROUTES = [100, 1000, 10000]
+DEFAULT_BUDGET_MS = 100.0
+DEFAULT_REQUESTS = 1000  # p99 then rests on the 10 slowest requests, not a single outlier
+WARMUP_CALLS = 50
+
+
+def synthetic_cube(n_routes: int, quarters: int = 40, seed: int = 0) -> pd.DataFrame:
+    """quarterly cube with a trend + seasonal fare series per route (one row per cell)"""
+    rng = np.random.default_rng(seed)
+    n_airports = int(np.ceil(np.sqrt(n_routes))) + 1
+    airports = np.array([f"A{i:04d}" for i in range(n_airports)])
+
+    pairs = [(o, d) for o in range(n_airports) for d in range(n_airports) if o != d][:n_routes]
+    origin = np.repeat([o for o, _ in pairs], quarters)
+    dest = np.repeat([d for _, d in pairs], quarters)
+    t = np.tile(np.arange(quarters), n_routes)
+
+    base = np.repeat(rng.uniform(120, 450, n_routes), quarters)
+    trend = np.repeat(rng.normal(0.5, 1.0, n_routes), quarters)
+    season = np.array([0.0, 12.0, 20.0, -8.0])[t % 4]
+    df = pd.DataFrame({
+        'Origin': airports[origin],
+        'Dest': airports[dest],
+        'Year': 2015 + t // 4,
+        'Quarter': t % 4 + 1,
+        data_loader.FARE_COL: base + trend * t + season + rng.normal(0, 8, len(t)),
+        data_loader.PASSENGER_COL: rng.integers(100, 5000, len(t)),
+    })
+    return aggregates.build_route_cube(df, 'Q', data_loader.FARE_COL, data_loader.PASSENGER_COL)
+
+
+def run(n_routes: int, requests: int, workers: int = None) -> dict:
+    cube = synthetic_cube(n_routes)
+
+    start = time.perf_counter()
+    forecast.MODELS = forecast.train_all(cube, workers)
+    train_seconds = time.perf_counter() - start
+
+    data_loader.QUARTERLY_CUBE = cube
+    routes = list(forecast.MODELS)
+    rng = np.random.default_rng(1)
+
+    # first calls pay plotly's one-off template / validator setup and warm the allocator
+    for route in routes[:WARMUP_CALLS]:
+        data_loader.generate_price_forecast_plot(route).to_plotly_json()
+    # training garbage is collected now rather than inside a timed request
+    gc.collect()
+
+    latencies = []
+    for route in rng.choice(routes, size=requests):
+        start = time.perf_counter()
+        data_loader.generate_price_forecast_plot(route).to_plotly_json()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'routes': len(routes),
+        'train_seconds': round(train_seconds, 3),
+        'requests': requests,
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'backtest': forecast.backtest_summary(forecast.MODELS),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="forecast view latency vs route count")
+    parser.add_argument('--routes', type=int, nargs='+', default=DEFAULT_ROUTES)
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help="p99 budget per request")
+    args = parser.parse_args()
+
+    results = [run(n, args.requests, args.workers) for n in args.routes]
+    over_budget = [r['routes'] for r in results if r['p99_ms'] > args.budget_ms]
+
+    print(json.dumps({'budget_ms': args.budget_ms, 'results': results}, indent=2))
+    if over_budget:
+        print(f"p99 over the {args.budget_ms}ms budget for {over_budget} routes", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# benchmarks/hot_paths.py
+#
+# end-to-end timings and peak memory of the data_loader and map hot paths on
+# synthetic DB1B-shaped data, emitted as JSON so runs can be compared across commits.
+# runs offline: the data is generated locally and cached under --data-root.
+#
+#   cd dash_interface && PYTHONPATH=. python benchmarks/hot_paths.py [--rows 1000000 10000000 50000000]
+#                                                                    [--output results.json]
+#
+# every size runs in its own interpreter, so module-level state and the
+# peak-RSS high-water mark start fresh for each one.
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DASH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AIRPORTS_CSV = os.path.join(DASH_DIR, 'src', 'data', 'airports.csv')
+
+DEFAULT_ROWS = [1_000_000, 10_000_000, 50_000_000]
+YEARS = range(2018, 2025)
+HUBS = ['LAX', 'LAS', 'DEN', 'JFK', 'ORD', 'DFW', 'SFO', 'SEA', 'MCO']
+CARRIERS = np.array(['AA', 'DL', 'UA', 'WN', 'AS', 'B6', 'NK', 'F9', '99'])
+
+
+# 1. synthetic data
+
+def generate_dataset(n_rows: int, out_dir: str, seed: int = 0):
+    """
+    write n_rows of DB1B-market-shaped rows as db1b_market_<year>_<q>.parquet files.
+    traffic is concentrated on the hub airports (so the market map routes exist)
+    with a long tail over the bundled airport table; fares grow with distance.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    airports = pd.read_csv(AIRPORTS_CSV)
+    codes = airports['code'].to_numpy()
+    lat, lon = np.radians(airports['lat'].to_numpy()), np.radians(airports['lon'].to_numpy())
+
+    weights = np.where(np.isin(codes, HUBS), 40.0, 1.0)
+    weights /= weights.sum()
+
+    quarters = [(year, quarter) for year in YEARS for quarter in range(1, 5)]
+    per_partition = n_rows // len(quarters)
+    rng = np.random.default_rng(seed)
+    itin_id = 0
+
+    for i, (year, quarter) in enumerate(quarters):
+        n = per_partition + (n_rows - per_partition * len(quarters) if i == len(quarters) - 1 else 0)
+        origin = rng.choice(len(codes), size=n, p=weights)
+        dest = rng.choice(len(codes), size=n, p=weights)
+        dest = np.where(dest == origin, (dest + 1) % len(codes), dest)
+
+        # great-circle distance in miles
+        a = (np.sin((lat[dest] - lat[origin]) / 2) ** 2
+             + np.cos(lat[origin]) * np.cos(lat[dest]) * np.sin((lon[dest] - lon[origin]) / 2) ** 2)
+        distance = np.round(3958.8 * 2 * np.arcsin(np.sqrt(a)))
+        fare = np.round((60 + 0.12 * distance) * rng.lognormal(0, 0.45, n) * (1 + 0.02 * (year - 2018)), 2)
+
+        table = pa.table({
+            'ItinID': np.arange(itin_id, itin_id + n, dtype=np.int64) + year * 10 ** 8,
+            'MktCoupons': rng.integers(1, 3, n),
+            'Year': np.full(n, year, dtype=np.int64),
+            'Quarter': np.full(n, quarter, dtype=np.int64),
+            'OriginAirportID': 10000 + origin,
+            'Origin': codes[origin],
+            'DestAirportID': 10000 + dest,
+            'Dest': codes[dest],
+            'TkCarrier': CARRIERS[rng.integers(0, len(CARRIERS), n)],
+            'MktFare': fare,
+            'MktDistance': distance,
+            'Passengers': rng.integers(1, 4, n).astype(np.float64),
+        })
+        itin_id += n
+        pq.write_table(table, os.path.join(out_dir, f"db1b_market_{year}_{quarter}.parquet"))
+
+    with open(os.path.join(out_dir, '_complete'), 'w') as f:
+        f.write(str(n_rows))
+
+
+def ensure_dataset(n_rows: int, data_root: str, seed: int) -> str:
+    out_dir = os.path.join(data_root, f"rows_{n_rows}_seed_{seed}")
+    if not os.path.exists(os.path.join(out_dir, '_complete')):
+        start = time.perf_counter()
+        generate_dataset(n_rows, out_dir, seed)
+        print(f"generated {n_rows} synthetic rows in {time.perf_counter() - start:.1f}s -> {out_dir}", file=sys.stderr)
+    return out_dir
+
+
+# 2. one size, measured inside a fresh interpreter
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 ** 2 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _measure(stages: dict, name: str, fn, repeat: int = 1):
+    """run fn `repeat` times; record the first (cold) and the best time plus the peak RSS so far"""
+    times = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+    except Exception as e:
+        stages[name] = {'error': f"{type(e).__name__}: {e}", 'peak_rss_mb': _peak_rss_mb()}
+        return None
+    stages[name] = {
+        'seconds': round(times[0], 4),
+        'best_seconds': round(min(times), 4),
+        'runs': repeat,
+        'peak_rss_mb': _peak_rss_mb(),
+        'arrow_allocated_mb': round(pa.total_allocated_bytes() / 1024 ** 2, 1),
+    }
+    return result
+
+
+def run_size(data_dir: str, repeat: int) -> dict:
+    """time the hot paths against data_dir (the environment is set up by the parent)"""
+    import folium
+    from src import data_loader, folium_map_generator
+
+    stages = {'baseline': {'peak_rss_mb': _peak_rss_mb()}}
+    route = "LAX-LAS"
+
+    _measure(stages, 'load_data', data_loader.load_data)
+    if not data_loader.is_ready():
+        return {'stages': stages, 'error': data_loader.LOAD_ERROR}
+
+    _measure(stages, 'generate_fare_trend_plot', lambda: data_loader.generate_fare_trend_plot(route), repeat)
+    _measure(stages, 'generate_passenger_volume_plot', lambda: data_loader.generate_passenger_volume_plot(route), repeat)
+
+    route_kpis, _ = folium_map_generator._compute_map_kpis()
+    _measure(
+        stages, '_add_kpi_layer',
+        lambda: folium_map_generator._add_kpi_layer(
+            folium.Map(location=[39.8283, -98.5795], zoom_start=4), route_kpis, 'Average Fare', 'fare', True
+        ),
+        repeat,
+    )
+    _measure(stages, 'create_folium_map', folium_map_generator.create_folium_map, repeat)
+
+    return {
+        'rows_loaded': int(data_loader.load_status()['rows']),
+        'routes': int(len(data_loader.QUARTERLY_CUBE.index.unique())),
+        'stages': stages,
+    }
+
+
+# 3. driver
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DASH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark data_loader and map generation on synthetic data")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--repeat', type=int, default=5, help="runs per plot / map stage")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-root', default=os.path.join(tempfile.gettempdir(), 'flight_benchmark_data'))
+    parser.add_argument('--output', default=None, help="also write the JSON report here")
+    parser.add_argument('--worker', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_size(args.worker, args.repeat)))
+        return
+
+    results = []
+    for n_rows in args.rows:
+        data_dir = ensure_dataset(n_rows, args.data_root, args.seed)
+        work_dir = tempfile.mkdtemp(prefix='flight_benchmark_')
+        env = {
+            **os.environ,
+            'PYTHONPATH': DASH_DIR,
+            'FLIGHT_PARQUET_DIR': data_dir,
+            'FLIGHT_CLEANED_DIR': os.path.join(work_dir, 'no_cleaned_data'),
+            'FLIGHT_SHARED_MEMORY': '0',
+            'FORECAST_DIR': os.path.join(work_dir, 'forecasts'),
+            # a fresh map directory per run, so create_folium_map is never a cache hit
+            'FLIGHT_MAP_DIR': os.path.join(work_dir, 'maps'),
+        }
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', data_dir, '--repeat', str(args.repeat)],
+            cwd=work_dir, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            result = {'error': proc.stderr.strip().splitlines()[-1:]}
+        else:
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append({'rows': n_rows, **result})
+        print(f"{n_rows} rows done.", file=sys.stderr)
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'pyarrow': pa.__version__,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+    # a failed stage has no timing; report it instead of passing it off as a result
+    failed = [
+        f"{result['rows']} rows: {name}" for result in results
+        for name, stage in result.get('stages', {}).items() if 'error' in stage
+    ] + [f"{result['rows']} rows" for result in results if 'error' in result]
+    if failed:
+        print(f"benchmark stages failed: {failed}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/refresh_consistency.py
+#
+# checks that an incremental refresh produces exactly the cubes of a full reload.
+# the newest --new partitions of the source directory are held back, the rest is
+# loaded, then they are added and refresh_data() merges them into the resident cubes;
+# every cube is compared with a full rebuild of the same partitions.
+#
+#   cd dash_interface && PYTHONPATH=. python benchmarks/refresh_consistency.py [--source DIR] [--new 2]
+#
+# exits 1 when any cube differs.
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+DASH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SOURCE = os.path.join(os.path.dirname(DASH_DIR), 'parquet_data')
+
+
+def compare(full: dict, merged: dict) -> dict:
+    """{cube name: None when identical, else the first difference}"""
+    import pandas as pd
+
+    result = {}
+    for name, frame in full.items():
+        try:
+            pd.testing.assert_frame_equal(frame, merged[name])
+            result[name] = None
+        except AssertionError as e:
+            result[name] = str(e).strip().splitlines()[0]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="incremental refresh vs full reload")
+    parser.add_argument('--source', default=DEFAULT_SOURCE, help="raw db1b_market_<year>_<q>.parquet directory")
+    parser.add_argument('--new', type=int, default=2, help="partitions added by the refresh")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='refresh_consistency_')
+    raw_dir = os.path.join(work_dir, 'raw')
+    os.makedirs(raw_dir)
+
+    # the loader reads its directories from the environment at import time
+    os.environ.update({
+        'FLIGHT_PARQUET_DIR': raw_dir,
+        'FLIGHT_CLEANED_DIR': os.path.join(work_dir, 'no_cleaned_data'),
+        'FLIGHT_SHARED_MEMORY': '0',
+        'FORECAST_DIR': os.path.join(work_dir, 'forecasts'),
+    })
+    from src import dataset, data_loader
+
+    partitions = dataset.list_partitions(os.path.abspath(args.source))
+    held_back = partitions[-args.new:]
+    for _, _, path in partitions[:-args.new]:
+        os.symlink(path, os.path.join(raw_dir, os.path.basename(path)))
+
+    data_loader.wait_until_ready()
+    for _, _, path in held_back:
+        os.symlink(path, os.path.join(raw_dir, os.path.basename(path)))
+    refresh = data_loader.refresh_data()
+
+    merged = {
+        'monthly': data_loader.MONTHLY_CUBE,
+        'quarterly': data_loader.QUARTERLY_CUBE,
+        'fare_hist': data_loader.FARE_HISTOGRAMS,
+        'carrier': data_loader.CARRIER_CUBE,
+        'carrier_hist': data_loader.CARRIER_HISTOGRAMS,
+    }
+    differences = compare(data_loader._build_frames(raw_dir), merged)
+
+    print(json.dumps({
+        'partitions': len(partitions),
+        'added': refresh.get('added'),
+        'refresh': refresh['status'],
+        'rows': {name: len(frame) for name, frame in merged.items()},
+        'differences': {name: diff for name, diff in differences.items() if diff},
+    }, indent=2))
+
+    if refresh['status'] != 'incremental' or any(differences.values()):
+        print("incremental refresh does not match a full reload", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
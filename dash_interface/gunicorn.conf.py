@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+#
+#   cd dash_interface && gunicorn -c gunicorn.conf.py wsgi:server
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+
+# worker processes and threads per worker; background callbacks poll for their
+# results, so threads keep those short requests from queueing behind slow ones
+workers = int(os.environ.get('FLIGHT_WORKERS', '2'))
+threads = int(os.environ.get('FLIGHT_THREADS', '4'))
+worker_class = 'gthread'
+
+# the first request of a worker may wait for its data load
+timeout = int(os.environ.get('FLIGHT_WORKER_TIMEOUT', '120'))
+
+# load the app in each worker, after the fork: the data load and the partition
+# watcher run on threads, which do not survive a fork from the master
+preload_app = False
+
+accesslog = '-'
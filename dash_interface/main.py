@@ -1,23 +1,81 @@
 # main.py
 
+import os
 from dash import Dash
 import dash_bootstrap_components as dbc 
 from src.components.layout import create_layout
 from src.callbacks import register_callbacks 
+from src.health import register_health_routes
+from src.metrics import register_profiling
+from src.payload import register_compression
+from src.network_map import register_network_routes
+from src.folium_map_generator import register_map_routes
+from src.refresh import register_refresh_routes, start_watcher
+from src.api import register_api_routes
+from src.data_loader import start_background_load
+from src.background import create_background_manager
+from src.warmup import enable_warmup
+
+# FLIGHT_DEBUG=1 runs the development server with the debugger and reloader;
+# production goes through wsgi.py / gunicorn.conf.py, which never enable them
+DEBUG = os.environ.get('FLIGHT_DEBUG', '0') == '1'
+
+
+def create_app(start_background: bool = True) -> Dash:
+    """
+    build the app, register every route and start loading the data.
+    with start_background=False the data load, warm-up and watcher are not started
+    (the reloader's parent process only watches files and never serves requests).
+    """
+    # slow analyses run as background callbacks when dash[diskcache] is installed
+    background_manager = create_background_manager()
 
-def main() -> None:
     app = Dash(
         __name__, 
         external_stylesheets=[dbc.themes.FLATLY], 
         suppress_callback_exceptions=True,
+        background_callback_manager=background_manager,
     )
     
     app.layout = create_layout(app)
     
-    register_callbacks(app)
-    
-    app.run(debug=True) 
+    register_callbacks(app, background_manager)
+
+    register_health_routes(app)
+
+    register_profiling(app)
+
+    register_compression(app)
+
+    register_network_routes(app)
+
+    register_map_routes(app)
+
+    register_refresh_routes(app)
+
+    register_api_routes(app)
+
+    if not start_background:
+        return app
+
+    # every loaded data version prebuilds the top routes' figures and the market map
+    enable_warmup()
+
+    # data loads in the background; layout and /healthz are served meanwhile
+    start_background_load()
+
+    # new quarters dropped into the data directory are merged in without a restart
+    start_watcher()
+
+    return app
+
+
+def main() -> None:
+    # under the reloader this module runs twice; only the child (WERKZEUG_RUN_MAIN) serves
+    serving = not DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    app = create_app(start_background=serving)
+    app.run(debug=DEBUG)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,336 @@
+# src/aggregates.py
+
+import numpy as np
+import pandas as pd
+
+# aggregate columns stored for every (Origin, Dest, Period) cell
+FARE_SUM = 'FareSum'
+FARE_COUNT = 'FareCount'
+FARE_MEAN = 'FareMean'
+PASSENGER_SUM = 'PassengerSum'
+ROW_COUNT = 'RowCount'
+PERIOD_COL = 'Period'
+
+CUBE_KEYS = ['Origin', 'Dest', PERIOD_COL]
+
+# undirected market cube: one row per (AirportA, AirportB, Period) with AirportA <= AirportB,
+# passengers and row counts kept per direction (AB is AirportA -> AirportB)
+MARKET_KEYS = ['AirportA', 'AirportB']
+PASSENGERS_AB = 'PassengersAB'
+PASSENGERS_BA = 'PassengersBA'
+ROWS_AB = 'RowsAB'
+ROWS_BA = 'RowsBA'
+
+# sparse fixed-bin fare histograms: one row per non-empty (Origin, Dest, Period, Bin) cell.
+# bin i covers [i * FARE_BIN_WIDTH, (i + 1) * FARE_BIN_WIDTH) for i < FARE_BINS; the
+# overflow bin FARE_BINS is open-ended and collects every fare at or above
+# FARE_BIN_WIDTH * FARE_BINS. each cell also keeps its largest fare, which bounds the
+# overflow bin. counts add up and maxima take the max, so histograms of several
+# periods (or routes) merge.
+FARE_BIN_WIDTH = 20.0
+FARE_BINS = 100
+BIN_COL = 'Bin'
+BIN_COUNT = 'Count'
+BIN_MAX = 'Max'
+
+# secondary indexes: the carrier cube is indexed by Carrier, the airport cubes by Airport
+# (every directed cell is listed under both of its endpoints, Other is the far end)
+CARRIER_KEY = 'Carrier'
+AIRPORT_KEY = 'Airport'
+OTHER_KEY = 'Other'
+OUTBOUND = 'Outbound'
+INBOUND = 'Inbound'
+
+
+# 1. cube construction
+
+def _period_labels(df: pd.DataFrame, freq: str, time_col: str) -> pd.Series:
+    """
+    period label for every row.
+    'M' uses month-end dates (the labels resample('M') produces),
+    'Q' uses the first day of the quarter from Year / Quarter.
+    """
+    if freq == 'M':
+        return df[time_col].dt.to_period('M').dt.to_timestamp(how='end').dt.normalize()
+    if freq == 'Q':
+        return pd.to_datetime(
+            pd.DataFrame({'year': df['Year'], 'month': df['Quarter'] * 3 - 2, 'day': 1})
+        )
+    raise ValueError(f"unsupported cube frequency: {freq}")
+
+
+def build_route_cube(df: pd.DataFrame, freq: str, fare_col: str, passenger_col: str,
+                     time_col: str = None) -> pd.DataFrame:
+    """
+    aggregate raw rows into one row per (Origin, Dest, Period).
+    the result is indexed by (Origin, Dest) and sorted, so a route lookup is an
+    index seek instead of a scan over the raw rows.
+    """
+    keyed = pd.DataFrame({
+        'Origin': df['Origin'],
+        'Dest': df['Dest'],
+        PERIOD_COL: _period_labels(df, freq, time_col),
+        # accumulate in 64 bits even when the raw columns are downcast
+        'fare': df[fare_col].astype(np.float64),
+        'passengers': df[passenger_col].astype(np.int64),
+    })
+    if freq == 'Q':
+        keyed['Year'] = df['Year']
+        keyed['Quarter'] = df['Quarter']
+
+    grouped = keyed.groupby(CUBE_KEYS, observed=True, sort=True)
+    cube = pd.DataFrame({
+        FARE_SUM: grouped['fare'].sum(),
+        FARE_COUNT: grouped['fare'].count(),
+        PASSENGER_SUM: grouped['passengers'].sum(),
+        ROW_COUNT: grouped.size(),
+    })
+    cube[FARE_MEAN] = cube[FARE_SUM] / cube[FARE_COUNT].where(cube[FARE_COUNT] > 0)
+
+    if freq == 'Q':
+        cube['Year'] = grouped['Year'].first()
+        cube['Quarter'] = grouped['Quarter'].first()
+
+    return cube.reset_index(level=PERIOD_COL)
+
+
+def fare_bins(fares) -> np.ndarray:
+    """histogram bin of every fare (negative fares land in bin 0, NaN in -1)"""
+    fares = np.asarray(fares, dtype=np.float64)
+    bins = np.clip(np.floor(fares / FARE_BIN_WIDTH), 0, FARE_BINS)
+    return np.where(np.isnan(fares), -1, bins).astype(np.int16)
+
+
+def build_fare_histograms(df: pd.DataFrame, fare_col: str, keys: dict = None) -> pd.DataFrame:
+    """
+    per (key, quarter) fare histograms in sparse long form (Period, Bin, Count, Max),
+    indexed by the key columns: (Origin, Dest) like the cubes by default, or e.g.
+    {'Carrier': carrier_col} for per-carrier histograms.
+    """
+    keys = keys or {'Origin': 'Origin', 'Dest': 'Dest'}
+    keyed = pd.DataFrame({name: df[col] for name, col in keys.items()})
+    keyed[PERIOD_COL] = _period_labels(df, 'Q', None)
+    keyed[BIN_COL] = fare_bins(df[fare_col])
+    keyed['fare'] = df[fare_col].astype(np.float64)
+    keyed = keyed[keyed[BIN_COL] >= 0]
+
+    grouped = keyed.groupby(list(keys) + [PERIOD_COL, BIN_COL], observed=True, sort=True)['fare']
+    cells = pd.DataFrame({BIN_COUNT: grouped.size().astype(np.int64), BIN_MAX: grouped.max()})
+    return cells.reset_index(level=[PERIOD_COL, BIN_COL])
+
+
+def build_carrier_cube(df: pd.DataFrame, carrier_col: str, fare_col: str, passenger_col: str) -> pd.DataFrame:
+    """
+    per (Carrier, Origin, Dest, quarter) aggregates, indexed by Carrier so a
+    carrier drilldown is one index seek. empty when the data has no carrier column.
+    """
+    if carrier_col not in df.columns:
+        return pd.DataFrame()
+
+    keyed = pd.DataFrame({
+        CARRIER_KEY: df[carrier_col],
+        'Origin': df['Origin'],
+        'Dest': df['Dest'],
+        PERIOD_COL: _period_labels(df, 'Q', None),
+        'fare': df[fare_col].astype(np.float64),
+        'passengers': df[passenger_col].astype(np.int64),
+    })
+
+    grouped = keyed.groupby([CARRIER_KEY] + CUBE_KEYS, observed=True, sort=True)
+    cube = pd.DataFrame({
+        FARE_SUM: grouped['fare'].sum(),
+        FARE_COUNT: grouped['fare'].count(),
+        PASSENGER_SUM: grouped['passengers'].sum(),
+        ROW_COUNT: grouped.size(),
+    })
+    return cube.reset_index(level=CUBE_KEYS)
+
+
+def _by_airport(cube: pd.DataFrame, keys) -> pd.DataFrame:
+    """
+    list every directed cell under both endpoints and sum per (Airport, *keys, Period);
+    Outbound / Inbound split the passengers by direction, fares count both ways.
+    """
+    cells = cube.reset_index()
+    origin = cells['Origin'].astype(str).to_numpy()
+    dest = cells['Dest'].astype(str).to_numpy()
+    passengers = cells[PASSENGER_SUM].to_numpy(dtype=np.int64)
+    zeros = np.zeros(len(cells), dtype=np.int64)
+
+    sides = []
+    for airport, other, outbound, inbound in [(origin, dest, passengers, zeros), (dest, origin, zeros, passengers)]:
+        side = pd.DataFrame({AIRPORT_KEY: airport, OTHER_KEY: other})
+        for key in keys:
+            if key != OTHER_KEY:
+                side[key] = cells[key].astype(str).to_numpy()
+        side[PERIOD_COL] = cells[PERIOD_COL].to_numpy()
+        side[OUTBOUND], side[INBOUND] = outbound, inbound
+        side[FARE_SUM] = cells[FARE_SUM].to_numpy()
+        side[FARE_COUNT] = cells[FARE_COUNT].to_numpy()
+        sides.append(side)
+
+    keyed = pd.concat(sides, ignore_index=True)
+    grouped = keyed.groupby([AIRPORT_KEY] + list(keys) + [PERIOD_COL], sort=True)
+    airport_cube = grouped[[OUTBOUND, INBOUND, FARE_SUM, FARE_COUNT]].sum()
+    airport_cube[PASSENGER_SUM] = airport_cube[OUTBOUND] + airport_cube[INBOUND]
+    return airport_cube.reset_index(level=list(keys) + [PERIOD_COL])
+
+
+def build_airport_cube(quarterly_cube: pd.DataFrame) -> pd.DataFrame:
+    """
+    airport secondary index over the quarterly cube: one row per
+    (Airport, Other, Period), built from the cube cells at load time.
+    """
+    if quarterly_cube is None or quarterly_cube.empty:
+        return pd.DataFrame()
+    return _by_airport(quarterly_cube, [OTHER_KEY])
+
+
+def build_airport_carrier_cube(carrier_cube: pd.DataFrame) -> pd.DataFrame:
+    """per (Airport, Carrier, Period) totals from the carrier cube, indexed by Airport"""
+    if carrier_cube is None or carrier_cube.empty:
+        return pd.DataFrame()
+    return _by_airport(carrier_cube, [CARRIER_KEY])
+
+
+def build_market_cube(quarterly_cube: pd.DataFrame) -> pd.DataFrame:
+    """
+    fold the directed quarterly cube into undirected markets.
+    each (origin, dest) pair maps to the canonical key (min, max); its passengers
+    land in the AB or BA column depending on direction. built from the cube cells,
+    not the raw rows, so it costs one groupby over (routes x quarters) cells.
+    """
+    if quarterly_cube is None or quarterly_cube.empty:
+        return pd.DataFrame()
+
+    cells = quarterly_cube.reset_index()
+    origin = cells['Origin'].astype(str).to_numpy()
+    dest = cells['Dest'].astype(str).to_numpy()
+    forward = origin <= dest
+    passengers = cells[PASSENGER_SUM].to_numpy(dtype=np.int64)
+    rows = cells[ROW_COUNT].to_numpy(dtype=np.int64)
+
+    keyed = pd.DataFrame({
+        MARKET_KEYS[0]: np.where(forward, origin, dest),
+        MARKET_KEYS[1]: np.where(forward, dest, origin),
+        PERIOD_COL: cells[PERIOD_COL],
+        'Year': cells['Year'],
+        'Quarter': cells['Quarter'],
+        PASSENGERS_AB: np.where(forward, passengers, 0),
+        PASSENGERS_BA: np.where(forward, 0, passengers),
+        ROWS_AB: np.where(forward, rows, 0),
+        ROWS_BA: np.where(forward, 0, rows),
+    })
+
+    grouped = keyed.groupby(MARKET_KEYS + [PERIOD_COL], sort=True)
+    market = grouped[[PASSENGERS_AB, PASSENGERS_BA, ROWS_AB, ROWS_BA]].sum()
+    market[PASSENGER_SUM] = market[PASSENGERS_AB] + market[PASSENGERS_BA]
+    market['Year'] = grouped['Year'].first()
+    market['Quarter'] = grouped['Quarter'].first()
+
+    return market.reset_index(level=PERIOD_COL)
+
+
+# 2. cube lookups
+
+def route_rows(cube: pd.DataFrame, origin: str, dest: str) -> pd.DataFrame:
+    """all periods for one directed route (empty when the route is unknown)"""
+    if cube is None or cube.empty:
+        return pd.DataFrame()
+    try:
+        rows = cube.loc[[(origin, dest)]]
+    except KeyError:
+        rows = cube.iloc[0:0]
+    return rows.reset_index(drop=True)
+
+
+def routes_rows(cube: pd.DataFrame, pairs) -> pd.DataFrame:
+    """
+    all periods for several directed routes, keeping Origin / Dest as columns.
+    one batched index lookup for the whole list (unknown routes are skipped),
+    so the cost follows the number of matching cells, not the cube size.
+    """
+    pairs = list(pairs)
+    if cube is None or cube.empty or not pairs:
+        return pd.DataFrame()
+
+    wanted = pd.MultiIndex.from_tuples(pairs, names=cube.index.names)
+    positions = cube.index.get_indexer_for(wanted)
+    positions = positions[positions >= 0]
+    if not len(positions):
+        return pd.DataFrame()
+
+    rows = cube.iloc[positions].reset_index()
+    for col in ['Origin', 'Dest']:
+        rows[col] = rows[col].astype(str)
+    return rows
+
+
+def market_key(origin: str, dest: str):
+    """canonical (AirportA, AirportB) key of the market between two airports"""
+    return (origin, dest) if origin <= dest else (dest, origin)
+
+
+def market_directions(market_cube: pd.DataFrame, origin: str, dest: str) -> pd.DataFrame:
+    """
+    quarterly passengers of both directions of a market in long form
+    (Year, Quarter, Origin, Dest, Period, PassengerSum), one index seek.
+    quarters without rows in a direction are left out, as in the directed cube.
+    """
+    airport_a, airport_b = market_key(origin, dest)
+    rows = route_rows(market_cube, airport_a, airport_b)
+    if rows.empty:
+        return pd.DataFrame()
+
+    directions = []
+    for (o, d), passengers_col, rows_col in [((airport_a, airport_b), PASSENGERS_AB, ROWS_AB),
+                                            ((airport_b, airport_a), PASSENGERS_BA, ROWS_BA)]:
+        present = rows[rows[rows_col] > 0]
+        directions.append(pd.DataFrame({
+            'Year': present['Year'],
+            'Quarter': present['Quarter'],
+            'Origin': o,
+            'Dest': d,
+            PERIOD_COL: present[PERIOD_COL],
+            PASSENGER_SUM: present[passengers_col],
+        }))
+    return pd.concat(directions, ignore_index=True)
+
+
+def airport_markets(airport_cube: pd.DataFrame, code: str) -> pd.DataFrame:
+    """
+    every market touching an airport with whole-history passengers per direction,
+    busiest first; Other is the airport at the far end of the market.
+    one seek into the airport cube instead of a scan over every market.
+    """
+    cells = key_rows(airport_cube, code)
+    if cells.empty:
+        return pd.DataFrame()
+
+    totals = cells.groupby(OTHER_KEY, sort=False)[[OUTBOUND, INBOUND, PASSENGER_SUM]].sum().reset_index()
+    return pd.DataFrame({
+        'Airport': code,
+        'Other': totals[OTHER_KEY],
+        'Outbound': totals[OUTBOUND],
+        'Inbound': totals[INBOUND],
+        PASSENGER_SUM: totals[PASSENGER_SUM],
+    }).sort_values(PASSENGER_SUM, ascending=False, ignore_index=True)
+
+
+def key_rows(cube: pd.DataFrame, key) -> pd.DataFrame:
+    """all rows of one key of a single-level indexed cube (carrier / airport), empty when unknown"""
+    if cube is None or cube.empty:
+        return pd.DataFrame()
+    try:
+        rows = cube.loc[[key]]
+    except KeyError:
+        rows = cube.iloc[0:0]
+    return rows.reset_index(drop=True)
+
+
+def ranked_keys(cube: pd.DataFrame) -> pd.Series:
+    """whole-history passengers per index key of a cube, busiest first"""
+    if cube is None or cube.empty:
+        return pd.Series(dtype=np.int64)
+    totals = cube.groupby(level=0, observed=True)[PASSENGER_SUM].sum()
+    return totals.sort_values(ascending=False, kind='stable')
@@ -0,0 +1,191 @@
+# src/api.py
+
+import io
+import os
+import pandas as pd
+import pyarrow as pa
+from dash import Dash
+from flask import Response, jsonify, request
+from src import data_loader, route_catalog, aggregates, timeseries
+from src.aggregates import PERIOD_COL
+from src.data_loader import parse_routes
+from src.folium_map_generator import map_kpis
+
+# read-only export of the aggregate layer for bulk consumers (instead of scraping the ui):
+#   GET /api/v1/catalog                  routes ranked by passengers (?q= search, ?limit=)
+#   GET /api/v1/trends                   route x period aggregates (?route=LAX-LAS, repeatable or
+#                                        comma separated, none = every route; ?granularity=M|Q|Y)
+#   GET /api/v1/map-kpis                 market map kpis (?level=route|airport)
+# every endpoint answers in csv, ndjson or arrow (ipc stream), chosen by ?format= or the
+# Accept header, streamed in chunks of API_CHUNK_ROWS rows. responses carry an ETag of
+# the data version, so unchanged data is revalidated with a 304 instead of re-downloaded.
+API_PREFIX = '/api/v1'
+API_CHUNK_ROWS = int(os.environ.get('FLIGHT_API_CHUNK_ROWS', '10000'))
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+DEFAULT_FORMAT = 'csv'
+
+# trend granularity -> cube the cells are read from
+TREND_CUBES = {'M': 'MONTHLY_CUBE', 'Q': 'QUARTERLY_CUBE', 'Y': 'QUARTERLY_CUBE'}
+
+
+class ApiError(Exception):
+    """bad request parameters, answered with a 400 and a json error"""
+
+
+# 1. serialization in chunks
+
+def _chunks(df):
+    for start in range(0, len(df), API_CHUNK_ROWS):
+        yield df.iloc[start:start + API_CHUNK_ROWS]
+
+
+def _stream_csv(df):
+    yield df.iloc[0:0].to_csv(index=False, date_format='%Y-%m-%d')
+    for chunk in _chunks(df):
+        yield chunk.to_csv(index=False, header=False, date_format='%Y-%m-%d')
+
+
+def _stream_ndjson(df):
+    for chunk in _chunks(df):
+        if len(chunk):
+            yield chunk.to_json(orient='records', lines=True, date_format='iso', date_unit='s') + '\n'
+
+
+def _stream_arrow(df):
+    """one arrow ipc stream: the schema, then a record batch per chunk"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        yield drain()
+        for batch in table.to_batches(max_chunksize=API_CHUNK_ROWS):
+            writer.write_batch(batch)
+            yield drain()
+    yield drain()
+
+
+STREAMS = {'csv': _stream_csv, 'ndjson': _stream_ndjson, 'arrow': _stream_arrow}
+
+
+# 2. content negotiation and conditional requests
+
+def _response_format() -> str:
+    fmt = request.args.get('format')
+    if fmt:
+        if fmt not in FORMATS:
+            raise ApiError(f"unsupported format {fmt!r}, use one of {sorted(FORMATS)}")
+        return fmt
+    best = request.accept_mimetypes.best_match(list(FORMATS.values()))
+    return next((name for name, mimetype in FORMATS.items() if mimetype == best), DEFAULT_FORMAT)
+
+
+def _export(version: str, build, name: str):
+    """
+    answer with build()'s frame in the negotiated format, or 304 when the client
+    already holds this data version's representation (If-None-Match).
+    the frame is only built when it has to be sent.
+    """
+    fmt = _response_format()
+    etag = f"{version}-{fmt}"
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        df = build()
+        response = Response(STREAMS[fmt](df), mimetype=FORMATS[fmt])
+        ext = 'arrows' if fmt == 'arrow' else fmt
+        response.headers['Content-Disposition'] = f'inline; filename="{name}_{version}.{ext}"'
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept')
+    return response
+
+
+# 3. aggregate tables
+
+def _routes_param() -> list:
+    routes = [route for value in request.args.getlist('route') for route in value.split(',') if route.strip()]
+    pairs = parse_routes(route.strip().upper() for route in routes)
+    if routes and not pairs:
+        raise ApiError("routes must look like ORIGIN-DEST")
+    return pairs
+
+
+def catalog_table(query: str = None, limit: int = None) -> pd.DataFrame:
+    """catalog routes (all, or the matches of a search) ranked by passengers"""
+    catalog = route_catalog.get_catalog()
+    ids = catalog.search(query, len(catalog) if limit is None else limit)
+    routes = [catalog.routes[i].split('-') for i in ids]
+    return pd.DataFrame({
+        'Rank': [i + 1 for i in ids],
+        'Origin': [origin for origin, _ in routes],
+        'Dest': [dest for _, dest in routes],
+        'Passengers': catalog.passengers[ids],
+    })
+
+
+def trend_table(cube: pd.DataFrame, pairs: list, granularity: str) -> pd.DataFrame:
+    """route x period aggregates of the given routes (every route without pairs); empty periods are left out"""
+    cells = aggregates.routes_rows(cube, pairs) if pairs else cube.reset_index()
+    if cells.empty:
+        return pd.DataFrame(columns=['Origin', 'Dest', PERIOD_COL] + timeseries.ADDITIVE_COLS + [aggregates.FARE_MEAN])
+    for col in ['Origin', 'Dest']:
+        cells[col] = cells[col].astype(str)
+    return timeseries.rollup(cells, granularity, by=['Origin', 'Dest'], complete=False)
+
+
+# 4. routes
+
+def register_api_routes(app: Dash):
+    """read-only export endpoints under API_PREFIX on the flask server"""
+    server = app.server
+
+    @server.errorhandler(ApiError)
+    def api_error(e):
+        return jsonify(error=str(e)), 400
+
+    def _not_ready():
+        return jsonify(data_loader.load_status()), 503
+
+    @server.route(f'{API_PREFIX}/catalog')
+    def api_catalog():
+        if not data_loader.is_ready():
+            return _not_ready()
+        query, limit = request.args.get('q'), request.args.get('limit', type=int)
+        version, _ = data_loader.snapshot()
+        return _export(version, lambda: catalog_table(query, limit), 'catalog')
+
+    @server.route(f'{API_PREFIX}/trends')
+    def api_trends():
+        if not data_loader.is_ready():
+            return _not_ready()
+        granularity = request.args.get('granularity', 'Q').upper()
+        if granularity not in TREND_CUBES:
+            raise ApiError(f"unsupported granularity {granularity!r}, use one of {sorted(TREND_CUBES)}")
+        pairs = _routes_param()
+
+        # the cube is read together with its version, so the ETag always matches the body
+        version, (cube,) = data_loader.snapshot(TREND_CUBES[granularity])
+        return _export(version, lambda: trend_table(cube, pairs, granularity), f"trends_{granularity}")
+
+    @server.route(f'{API_PREFIX}/map-kpis')
+    def api_map_kpis():
+        if not data_loader.is_ready():
+            return _not_ready()
+        level = request.args.get('level', 'route')
+        if level not in ('route', 'airport'):
+            raise ApiError(f"unsupported level {level!r}, use 'route' or 'airport'")
+
+        version, _ = data_loader.snapshot()
+        return _export(version, lambda: map_kpis()[0 if level == 'route' else 1], f"map_kpis_{level}")
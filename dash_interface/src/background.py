@@ -0,0 +1,48 @@
+# src/background.py
+
+import os
+import tempfile
+from src.figure_cache import FIGURE_CACHE, FileBackend
+
+# run slow analyses (first map render of a data version, uncached figures) as dash
+# background callbacks in their own processes; FLIGHT_BACKGROUND_CALLBACKS=0 keeps
+# every callback on the request thread
+BACKGROUND_ENABLED = os.environ.get('FLIGHT_BACKGROUND_CALLBACKS', '1') != '0'
+
+# diskcache directory for job results and progress (shared by every worker on the host)
+BACKGROUND_DIR = os.environ.get(
+    'FLIGHT_BACKGROUND_DIR', os.path.join(tempfile.gettempdir(), 'flight_dashboard', 'background')
+)
+
+# finished job results nobody picked up are dropped after this many seconds
+BACKGROUND_EXPIRE = int(os.environ.get('FLIGHT_BACKGROUND_EXPIRE', '600'))
+
+# how often the browser polls a running job for progress / its result (ms)
+POLL_INTERVAL_MS = 500
+
+
+def create_background_manager():
+    """
+    DiskcacheManager for the app's background callbacks, or None when disabled or
+    when the optional `dash[diskcache]` extra (diskcache, multiprocess, psutil) is
+    not installed, in which case every analysis runs synchronously as before.
+
+    jobs run in forked processes, so a figure they build would only land in the
+    job's own copy of FIGURE_CACHE; without a configured shared backend the cache
+    gets a file backend next to the job results so the next request finds it.
+    """
+    if not BACKGROUND_ENABLED:
+        return None
+
+    try:
+        import diskcache  # optional dependency
+        from dash import DiskcacheManager
+        manager = DiskcacheManager(diskcache.Cache(BACKGROUND_DIR), expire=BACKGROUND_EXPIRE)
+    except ImportError:
+        print("diskcache not installed (pip install 'dash[diskcache]'); background callbacks disabled.")
+        return None
+
+    if FIGURE_CACHE.backend is None:
+        FIGURE_CACHE.backend = FileBackend(os.path.join(BACKGROUND_DIR, 'figures'))
+    print(f"background callbacks enabled (results in {BACKGROUND_DIR}).")
+    return manager
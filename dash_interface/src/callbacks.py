@@ -1,69 +1,271 @@
 # src/callbacks.py
 
-from dash import Dash, html, dcc
-from dash.dependencies import Input, Output
+import time
+from dash import Dash, html, dcc, no_update
+from dash.exceptions import PreventUpdate
+from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
+from src import data_loader, route_catalog, metrics, payload, warmup
 from src.data_loader import (
     generate_fare_trend_plot, 
     generate_price_forecast_plot,
     generate_passenger_volume_plot, 
+    generate_route_comparison_plot,
+    generate_airport_hub_plot,
+    generate_carrier_plot,
+    generate_fare_distribution_plot,
 )
 # Map generator
-from src.folium_map_generator import create_folium_map 
+from src.folium_map_generator import get_market_map, map_ready
+from src.figure_cache import FIGURE_CACHE
+from src.background import POLL_INTERVAL_MS
 from dash import callback
 import pandas as pd 
 
+# how often open pages check for a refreshed data version once the first load is done
+VERSION_POLL_MS = 30000
 
-def register_callbacks(app: Dash):
+# routes drawn at most in one comparison figure
+COMPARE_MAX_ROUTES = 20
+
+# analyses with granularity / rolling statistics options (src/timeseries.py)
+TREND_ANALYSES = ('fare-trend', 'volume-trend')
+
+# figure-based analyses that run as background jobs until their figure is cached
+# (the market map goes to the background until it is rendered for the data version)
+BACKGROUND_FIGURES = ('price-forecast', 'route-comparison')
+
+# drilldowns keyed by an airport / a carrier instead of a route
+DRILLDOWN_ANALYSES = ('airport-hub', 'carrier-drilldown')
+
+# analyses without a route (the metrics route label is 'none' for these)
+ROUTELESS_ANALYSES = ('market-map', 'network-map', 'route-comparison') + DRILLDOWN_ANALYSES
+
+
+def _warming_up_content():
+    status = data_loader.load_status()
+    if status['state'] == 'failed':
+        return dbc.Alert(f"Data could not be loaded: {status['error']}", color="danger")
+    return dbc.Alert(
+        [
+            dbc.Spinner(size="sm", spinner_class_name="me-2"),
+            "Warming up: flight data is still loading. The view will refresh automatically.",
+        ],
+        color="info",
+    )
+
+
+def _comparison_routes(compare_routes: list) -> list:
+    """selected comparison routes without duplicates, capped at COMPARE_MAX_ROUTES"""
+    return list(dict.fromkeys(compare_routes or []))[:COMPARE_MAX_ROUTES]
+
+
+def _needs_background(analysis_type: str, route: str, compare_routes: list) -> bool:
+    """True when the analysis has to be computed (not just read from a cache)"""
+    if analysis_type == 'market-map':
+        return not map_ready()
+    if analysis_type in BACKGROUND_FIGURES:
+        key_route = ','.join(_comparison_routes(compare_routes)) if analysis_type == 'route-comparison' else route
+        if not key_route:
+            return False
+        return not FIGURE_CACHE.contains(FIGURE_CACHE.make_key(analysis_type, key_route, data_loader.DATA_VERSION))
+    return False
+
+
+def _background_placeholder():
+    """shown while a background job computes the analysis; the job replaces it"""
+    return [
+        dbc.Alert(
+            "Computing this analysis in the background. "
+            "Switching the analysis type or route cancels it.",
+            color="info",
+            className="mb-3"
+        ),
+        dbc.Progress(id='background-progress', value=0, label="queued", striped=True, animated=True, className="mb-3"),
+        dbc.Button("Cancel", id='cancel-analysis-button', color="secondary", size="sm", disabled=True),
+    ]
+
+
+def register_callbacks(app: Dash, background_manager=None):
+
+    # figures of superseded data versions are dropped once a new version is live
+    data_loader.add_install_listener(FIGURE_CACHE.prune_versions)
+
+    # 0. Warm-up polling: publish the data version once the background load is done,
+    # then keep polling slowly so refreshed data versions reach open pages
+    @app.callback(
+        [Output('data-version-store', 'data'),
+         Output('warmup-interval', 'interval'),
+         Output('warmup-interval', 'disabled')],
+        Input('warmup-interval', 'n_intervals'),
+        State('data-version-store', 'data'),
+    )
+    def poll_data_ready(n_intervals: int, known_version: str):
+        if data_loader.is_ready():
+            version = data_loader.DATA_VERSION
+            return (no_update if version == known_version else version), VERSION_POLL_MS, False
+        # keep polling while loading; stop on failure (update_content shows the error)
+        return no_update, no_update, data_loader.LOAD_STATE == 'failed'
     
     # 1. Visibility control callback
     @app.callback(
         [Output('route-selection-container', 'style'),
-         Output('map-kpi-control', 'style')],
+         Output('compare-selection-container', 'style'),
+         Output('map-kpi-control', 'style'),
+         Output('trend-options-control', 'style'),
+         Output('airport-selection-container', 'style'),
+         Output('carrier-selection-container', 'style')],
         Input('analysis-type-dropdown', 'value'),
     )
     def update_controls_visibility(analysis_type: str):
         route_style = {} 
+        compare_style = {'display': 'none'}
         map_kpi_style = {'display': 'none'} 
+        trend_style = {} if analysis_type in TREND_ANALYSES else {'display': 'none'}
         
-        if analysis_type == 'market-map':
+        if analysis_type in ('market-map', 'network-map'):
+            route_style = {'display': 'none'}
+
+        if analysis_type == 'route-comparison':
+            route_style, compare_style = {'display': 'none'}, {}
+
+        airport_style = {} if analysis_type == 'airport-hub' else {'display': 'none'}
+        carrier_style = {} if analysis_type == 'carrier-drilldown' else {'display': 'none'}
+        if analysis_type in DRILLDOWN_ANALYSES:
             route_style = {'display': 'none'}
             
-        return route_style, map_kpi_style
+        return route_style, compare_style, map_kpi_style, trend_style, airport_style, carrier_style
+
+    # 1b. Route search: options come from the server-side catalog, top matches only
+    @app.callback(
+        Output('route-dropdown', 'options'),
+        [Input('route-dropdown', 'search_value'),
+         Input('data-version-store', 'data')],
+        State('route-dropdown', 'value'),
+    )
+    def update_route_options(search_value: str, data_version: str, selected_route: str):
+        if not data_loader.is_ready():
+            return no_update
+        return route_catalog.route_options(search_value, selected_route)
+
+    @app.callback(
+        Output('compare-routes-dropdown', 'options'),
+        [Input('compare-routes-dropdown', 'search_value'),
+         Input('data-version-store', 'data')],
+        State('compare-routes-dropdown', 'value'),
+    )
+    def update_compare_options(search_value: str, data_version: str, selected_routes: list):
+        if not data_loader.is_ready():
+            return no_update
+        return route_catalog.route_options(search_value, selected_routes)
+
+    @app.callback(
+        Output('airport-dropdown', 'options'),
+        [Input('airport-dropdown', 'search_value'),
+         Input('data-version-store', 'data')],
+        State('airport-dropdown', 'value'),
+    )
+    def update_airport_options(search_value: str, data_version: str, selected_airport: str):
+        if not data_loader.is_ready():
+            return no_update
+        return route_catalog.airport_options(search_value, selected_airport)
+
+    @app.callback(
+        Output('carrier-dropdown', 'options'),
+        [Input('carrier-dropdown', 'search_value'),
+         Input('data-version-store', 'data')],
+        State('carrier-dropdown', 'value'),
+    )
+    def update_carrier_options(search_value: str, data_version: str, selected_carrier: str):
+        if not data_loader.is_ready():
+            return no_update
+        return route_catalog.carrier_options(search_value, selected_carrier)
 
     # 2. Main content callback
     @app.callback(
         [Output('content-output', 'children'),
          Output('map-kpi-dropdown', 'options'),
-         Output('map-kpi-dropdown', 'value')],
+         Output('map-kpi-dropdown', 'value'),
+         Output('background-request', 'data')],
         [Input('analysis-type-dropdown', 'value'),
-         Input('route-dropdown', 'value')],
+         Input('route-dropdown', 'value'),
+         Input('compare-routes-dropdown', 'value'),
+         Input('granularity-dropdown', 'value'),
+         Input('trend-stats-checklist', 'value'),
+         Input('airport-dropdown', 'value'),
+         Input('carrier-dropdown', 'value'),
+         Input('data-version-store', 'data')],
         prevent_initial_call=False 
     )
-    def update_content(analysis_type: str, route: str):
+    def update_content(analysis_type: str, route: str, compare_routes: list,
+                       granularity: str, trend_stats: list, airport: str, carrier: str, data_version: str):
+        # one latency observation per call; the spans inside add the per-stage breakdown
+        route_label = None if analysis_type in ROUTELESS_ANALYSES else route
+        trend_options = {'granularity': granularity, 'stats': sorted(trend_stats or [])}
+        # drilldowns are rendered like a route view, keyed by the airport / carrier
+        if analysis_type == 'airport-hub':
+            route = airport
+        elif analysis_type == 'carrier-drilldown':
+            route = carrier
+        # request counts decide what the next deploy warms up (src/warmup.py)
+        warmup.record_request(analysis_type, route)
+        with metrics.request_labels(analysis_type, route_label):
+            return render_content(analysis_type, route, compare_routes, trend_options)
+
+    def render_content(analysis_type: str, route: str, compare_routes: list = None, trend_options: dict = None):
         
         default_kpi_options = [{'label': 'Fare', 'value': 'fare'}]
         default_kpi_value = 'fare'
 
+        # Data still loading in the background
+        if not data_loader.is_ready():
+            return _warming_up_content(), default_kpi_options, default_kpi_value, no_update
+
+        # Slow analyses are handed to a background job (progress + cancel) instead
+        # of holding this request thread
+        if background_manager is not None and _needs_background(analysis_type, route, compare_routes):
+            request = {
+                'analysis_type': analysis_type,
+                'route': route,
+                'compare_routes': compare_routes,
+                'trend_options': trend_options,
+                'requested_at': time.time(),
+            }
+            return _background_placeholder(), default_kpi_options, default_kpi_value, request
+
+        content = render_analysis(analysis_type, route, compare_routes, trend_options)
+        return content, default_kpi_options, default_kpi_value, no_update
+
+    def render_analysis(analysis_type: str, route: str, compare_routes: list = None,
+                        trend_options: dict = None, progress=None):
+        """content of one analysis; background jobs pass progress(percent, label)"""
+        progress = progress or (lambda percent, label: None)
+        trend_options = trend_options or {}
+
         # Market map analysis type
         if analysis_type == 'market-map':
             
-            map_component, fare_colormap, volume_colormap, status_diagnostics = create_folium_map()
+            # Pre-rendered map for the current data version (served from assets/)
+            progress(10, "rendering market map")
+            with metrics.span('map'):
+                map_component, legend_ranges, status_diagnostics = get_market_map()
             
             # Use vmin / vmax from colormap
-            if fare_colormap:
+            if legend_ranges['fare']:
+                fare_vmin, fare_vmax = legend_ranges['fare']
                 fare_legend_html = (
-                    f"**Avg Fare:** low ({fare_colormap.vmin:.0f}, Green) → "
-                    f"high ({fare_colormap.vmax:.0f}, Red)"
+                    f"**Avg Fare:** low ({fare_vmin:.0f}, Green) → "
+                    f"high ({fare_vmax:.0f}, Red)"
                 )
             else:
                 fare_legend_html = "**Avg Fare:** Failed to display"
                  
-            if volume_colormap:
+            if legend_ranges['volume']:
+                volume_vmin, volume_vmax = legend_ranges['volume']
                 # Format as integers with comma separators
                 volume_legend_html = (
-                    f"**Total Volume:** low ({volume_colormap.vmin:,.0f}, Red) → "
-                    f"high ({volume_colormap.vmax:,.0f}, Green)"
+                    f"**Total Volume:** low ({volume_vmin:,.0f}, Red) → "
+                    f"high ({volume_vmax:,.0f}, Green)"
                 )
             else:
                 volume_legend_html = "**Total Volume:** Failed to display"
@@ -98,34 +300,99 @@ def register_callbacks(app: Dash):
                 # Embed Folium map
                 html.Div(map_component, id='main-analysis-map-container'),
             ]
-            return content, default_kpi_options, default_kpi_value
+            return content
+
+        # National network map: routes are aggregated server-side and drawn
+        # client-side from one compact payload (see src/network_map.py)
+        if analysis_type == 'network-map':
+            content = [
+                html.H3("National Route Network", className="mb-4 text-center"),
+                dbc.Alert(
+                    "Line color shows average fare (or passengers), line width shows passenger volume. "
+                    "Use the selector on the map to change how many of the busiest routes are drawn.",
+                    color="light",
+                    className="mb-3"
+                ),
+                html.Iframe(
+                    id="network-map-iframe",
+                    src=f"/network/map?v={data_loader.DATA_VERSION}",
+                    style={"width": "100%", "height": "650px", "border": "none"}
+                ),
+            ]
+            return content
+
+        # Route comparison: all selected routes in one batched lookup and one figure
+        if analysis_type == 'route-comparison':
+            routes = _comparison_routes(compare_routes)
+            if not routes:
+                return dbc.Alert("Please select at least one route to compare.", color="warning")
+
+            notice = None
+            selected = len(dict.fromkeys(compare_routes))
+            if selected > len(routes):
+                notice = dbc.Alert(
+                    f"Showing the first {len(routes)} of {selected} selected routes.",
+                    color="light", className="mb-3"
+                )
+
+            progress(10, f"aggregating {len(routes)} routes")
+            graph_figure = FIGURE_CACHE.get_or_build(
+                analysis_type, ','.join(routes), data_loader.DATA_VERSION,
+                lambda: payload.encode_figure(generate_route_comparison_plot(routes)),
+            )
+            content = [
+                html.H3(f"Analysis Results: Route Comparison – {len(routes)} routes", className="mb-4 text-center"),
+                notice,
+                dcc.Graph(figure=graph_figure, id='main-analysis-graph'),
+            ]
+            return [c for c in content if c is not None]
 
         # Other analysis logic
         if not route:
-            return (
-                dbc.Alert("Please select a route to display the results.", color="warning"),
-                default_kpi_options,
-                default_kpi_value
-            )
+            subject = {'airport-hub': "an airport", 'carrier-drilldown': "a carrier"}.get(analysis_type, "a route")
+            return dbc.Alert(f"Please select {subject} to display the results.", color="warning")
 
         elif analysis_type == 'fare-trend':
-            graph_figure = generate_fare_trend_plot(route)
+            build_figure = generate_fare_trend_plot
             title = f"Analysis Results: Average Fare Trend – {route}"
             
         elif analysis_type == 'volume-trend':
-            graph_figure = generate_passenger_volume_plot(route)
+            build_figure = generate_passenger_volume_plot
             title = f"Analysis Results: Total Passenger Volume Trend – {route}"
             
         elif analysis_type == 'price-forecast':
-            graph_figure = generate_price_forecast_plot(route)
+            build_figure = generate_price_forecast_plot
             title = f"Analysis Results: Price Forecast – {route}"
+
+        elif analysis_type == 'fare-distribution':
+            build_figure = generate_fare_distribution_plot
+            title = f"Analysis Results: Fare Distribution – {route}"
+
+        elif analysis_type == 'airport-hub':
+            build_figure = generate_airport_hub_plot
+            title = f"Analysis Results: Airport Hub – {route}"
+
+        elif analysis_type == 'carrier-drilldown':
+            build_figure = generate_carrier_plot
+            title = f"Analysis Results: Carrier Drilldown – {route}"
             
         else:
-            return (
-                dbc.Alert("Please select an analysis type.", color="secondary"),
-                default_kpi_options,
-                default_kpi_value
-            )
+            return dbc.Alert("Please select an analysis type.", color="secondary")
+
+        # Trend views take the granularity / rolling statistics options
+        options = {}
+        cache_route = route
+        if analysis_type in TREND_ANALYSES and (trend_options.get('granularity') or trend_options.get('stats')):
+            options = {'granularity': trend_options.get('granularity'), 'stats': tuple(trend_options.get('stats') or ())}
+            cache_route = f"{route}|{options['granularity'] or ''}|{','.join(options['stats'])}"
+
+        # Figures are deterministic per data version, so they are memoized
+        # (stored as typed-array payloads, long series downsampled)
+        progress(10, "building figure")
+        graph_figure = FIGURE_CACHE.get_or_build(
+            analysis_type, cache_route, data_loader.DATA_VERSION,
+            lambda: payload.encode_figure(build_figure(route, **options)),
+        )
         
         content = [
             html.H3(title, className="mb-4 text-center"),
@@ -136,4 +403,33 @@ def register_callbacks(app: Dash):
             )
         ]
         
-        return content, default_kpi_options, default_kpi_value
+        return content
+
+    # 3. Background jobs for slow analyses (only with a background callback manager):
+    # the job replaces the placeholder once done; switching the analysis type or the
+    # route, or pressing Cancel, terminates it
+    if background_manager is not None:
+
+        @app.callback(
+            Output('content-output', 'children', allow_duplicate=True),
+            Input('background-request', 'data'),
+            background=True,
+            progress=[Output('background-progress', 'value'),
+                      Output('background-progress', 'label')],
+            running=[(Output('cancel-analysis-button', 'disabled'), False, True)],
+            cancel=[Input('analysis-type-dropdown', 'value'),
+                    Input('route-dropdown', 'value'),
+                    Input('compare-routes-dropdown', 'value'),
+                    Input('cancel-analysis-button', 'n_clicks')],
+            interval=POLL_INTERVAL_MS,
+            prevent_initial_call=True,
+        )
+        def run_background_analysis(set_progress, request: dict):
+            if not request:
+                raise PreventUpdate
+            analysis_type, route = request['analysis_type'], request['route']
+            with metrics.request_labels(analysis_type, None if analysis_type in ROUTELESS_ANALYSES else route):
+                return render_analysis(
+                    analysis_type, route, request['compare_routes'], request['trend_options'],
+                    lambda percent, label: set_progress((percent, label)),
+                )
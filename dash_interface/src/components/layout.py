@@ -3,14 +3,17 @@
 from dash import Dash, html, dcc
 import dash_bootstrap_components as dbc 
 
-ROUTE_OPTIONS = [
-    {"label": "LAX - LAS", "value": "LAX-LAS"},
-    {"label": "DEN - JFK", "value": "DEN-JFK"},
-    {"label": "ORD - DFW", "value": "ORD-DFW"},
-    {"label": "LAX - SFO", "value": "LAX-SFO"},
-    {"label": "JFK - MCO", "value": "JFK-MCO"},
-    {"label": "SFO - SEA", "value": "SFO-SEA"},
-]
+# the route catalog is searched server-side (src/route_catalog.py), so the page
+# only ships the default route; matches are served through the dropdown's search_value
+DEFAULT_ROUTE = "LAX-LAS"
+ROUTE_OPTIONS = [{"label": "LAX - LAS", "value": DEFAULT_ROUTE}]
+
+# routes preselected in the comparison view (searched through the same catalog)
+DEFAULT_COMPARE_ROUTES = [DEFAULT_ROUTE, "LAS-LAX"]
+
+# drilldown defaults; the other airports / carriers are searched server-side as well
+DEFAULT_AIRPORT = "LAX"
+DEFAULT_CARRIER = "DL"
 
 # 2. layout function
 def create_layout(app: Dash) -> html.Div:
@@ -22,6 +25,11 @@ def create_layout(app: Dash) -> html.Div:
         {"label": "2. Passenger Volume Trend", "value": "volume-trend"},
         {"label": "3. Price Forecast", "value": "price-forecast"},
         {"label": "4. Market Map", "value": "market-map"},
+        {"label": "5. National Network Map", "value": "network-map"},
+        {"label": "6. Route Comparison", "value": "route-comparison"},
+        {"label": "7. Airport Hub Drilldown", "value": "airport-hub"},
+        {"label": "8. Carrier Drilldown", "value": "carrier-drilldown"},
+        {"label": "9. Fare Distribution", "value": "fare-distribution"},
     ]
 
     return dbc.Container( 
@@ -51,20 +59,72 @@ def create_layout(app: Dash) -> html.Div:
                 
                 # right
                 dbc.Col(
-                    html.Div(
-                        id="route-selection-container",
-                        children=[
-                            html.Label("Select (Origin-Dest):", className="fw-bold mb-2"),
-                            dcc.Dropdown(
-                                id="route-dropdown",
-                                options=ROUTE_OPTIONS,
-                                value=ROUTE_OPTIONS[0]["value"], 
-                                clearable=False,
-                                placeholder="Select (Origin-Dest)",
-                            )
-                        ],
-                        className="p-3 border rounded h-100"
-                    ),
+                    [
+                        html.Div(
+                            id="route-selection-container",
+                            children=[
+                                html.Label("Select (Origin-Dest):", className="fw-bold mb-2"),
+                                dcc.Dropdown(
+                                    id="route-dropdown",
+                                    options=ROUTE_OPTIONS,
+                                    value=DEFAULT_ROUTE,
+                                    clearable=False,
+                                    placeholder="Select (Origin-Dest)",
+                                )
+                            ],
+                            className="p-3 border rounded h-100"
+                        ),
+                        # multi-select, only shown for the route comparison
+                        html.Div(
+                            id="compare-selection-container",
+                            children=[
+                                html.Label("Compare routes (Origin-Dest):", className="fw-bold mb-2"),
+                                dcc.Dropdown(
+                                    id="compare-routes-dropdown",
+                                    options=[
+                                        {"label": route.replace('-', ' - '), "value": route}
+                                        for route in DEFAULT_COMPARE_ROUTES
+                                    ],
+                                    value=DEFAULT_COMPARE_ROUTES,
+                                    multi=True,
+                                    placeholder="Search and add routes",
+                                )
+                            ],
+                            style={'display': 'none'},
+                            className="p-3 border rounded h-100"
+                        ),
+                        # airport / carrier pickers, only shown for their drilldowns
+                        html.Div(
+                            id="airport-selection-container",
+                            children=[
+                                html.Label("Select airport:", className="fw-bold mb-2"),
+                                dcc.Dropdown(
+                                    id="airport-dropdown",
+                                    options=[{"label": DEFAULT_AIRPORT, "value": DEFAULT_AIRPORT}],
+                                    value=DEFAULT_AIRPORT,
+                                    clearable=False,
+                                    placeholder="Search airport code or name",
+                                )
+                            ],
+                            style={'display': 'none'},
+                            className="p-3 border rounded h-100"
+                        ),
+                        html.Div(
+                            id="carrier-selection-container",
+                            children=[
+                                html.Label("Select carrier:", className="fw-bold mb-2"),
+                                dcc.Dropdown(
+                                    id="carrier-dropdown",
+                                    options=[{"label": DEFAULT_CARRIER, "value": DEFAULT_CARRIER}],
+                                    value=DEFAULT_CARRIER,
+                                    clearable=False,
+                                    placeholder="Search carrier code",
+                                )
+                            ],
+                            style={'display': 'none'},
+                            className="p-3 border rounded h-100"
+                        ),
+                    ],
                     md=6, 
                 ),
             ], className="g-4 mb-4"), 
@@ -96,9 +156,59 @@ def create_layout(app: Dash) -> html.Div:
                 justify="start", 
                 className="mb-4"
             ),
+
+            # Trend options (fare / volume trends): granularity and rolling statistics
+            dbc.Row(
+                dbc.Col(
+                    html.Div(
+                        id='trend-options-control',
+                        children=[
+                            dbc.Label("Granularity:", html_for="granularity-dropdown", className="fw-bold mb-2"),
+                            dcc.Dropdown(
+                                id='granularity-dropdown',
+                                options=[
+                                    {'label': 'Monthly', 'value': 'M'},
+                                    {'label': 'Quarterly', 'value': 'Q'},
+                                    {'label': 'Yearly', 'value': 'Y'},
+                                ],
+                                value=None,
+                                placeholder="Default",
+                                className="mb-2"
+                            ),
+                            dcc.Checklist(
+                                id='trend-stats-checklist',
+                                options=[
+                                    {'label': ' Rolling mean', 'value': 'rolling'},
+                                    {'label': ' Year-over-year change', 'value': 'yoy'},
+                                    {'label': ' Fare percentiles', 'value': 'percentiles'},
+                                ],
+                                value=[],
+                                inline=True,
+                                inputClassName="ms-3",
+                            ),
+                        ],
+
+                        style={'display': 'none'},
+                        className="p-3 border rounded"
+                    ),
+
+                    md=6
+                ),
+                justify="start",
+                className="mb-4"
+            ),
             # ------------------------------------------------------------------
 
 
+            # Data warm-up: polls until the background load is ready, then
+            # publishes the data version so the content callback re-renders
+            # (afterwards it keeps polling slowly to pick up refreshed versions)
+            dcc.Interval(id="warmup-interval", interval=1000, n_intervals=0),
+            dcc.Store(id="data-version-store"),
+
+            # request for a slow analysis, picked up by the background job callback
+            dcc.Store(id="background-request"),
+
             # Chart and Output Area
             html.Div(
                 id="content-output",
@@ -1,193 +1,1051 @@
 # src/data_loader.py
 
+import os
+import threading
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import numpy as np  # import numpy for data processing
+from src import dataset, aggregates, shared_store, forecast, timeseries
+from src.metrics import span
+from src.aggregates import PERIOD_COL, FARE_MEAN, PASSENGER_SUM
 
 # global constants
 TIME_COL = 'random_date'
 FARE_COL = 'MktFare'
 ROUTE_COL = 'Route'
 PASSENGER_COL = 'Passengers'  # row-level passenger column from raw data
+# carrier of each row, only aggregated into the carrier cubes and not kept per row:
+# the operating carrier in DB1B market data, the ticketing carrier in files without it
+CARRIER_COLS = ['OPERATING_CARRIER', 'TkCarrier']
+
+# only the columns the plots and the map actually use are read from parquet_data/
+# (TIME_COL comes precomputed from the ETL output; ItinID is only read to derive it from raw files)
+ID_COL = 'ItinID'
+LOAD_COLUMNS = [ID_COL, TIME_COL, 'Year', 'Quarter', 'Origin', 'Dest', PASSENGER_COL, FARE_COL] + CARRIER_COLS
+
+# the scanned rows only live while the cubes are built; the cubes are the resident state.
+# compact schema for the scanned rows (and so the cube keys): categorical airport codes,
+# narrow numeric dtypes (FLIGHT_COMPACT_SCHEMA=0 keeps the default pandas dtypes)
+COMPACT_SCHEMA = os.environ.get('FLIGHT_COMPACT_SCHEMA', '1') != '0'
+COMPACT_DTYPES = {'Year': np.int16, 'Quarter': np.int8, PASSENGER_COL: np.int32, FARE_COL: np.float32}
+
+# materialize the loaded frames once per host as memory-mapped Arrow files (see src/shared_store.py)
+SHARED_MEMORY = os.environ.get('FLIGHT_SHARED_MEMORY', '0') == '1'
+SHARED_LAYOUT = 2  # bump when the columns of the published cubes change
 
 # global variables
-DF_DATA = pd.DataFrame() 
+PARTITIONS = []
+DATA_VERSION = None  # fingerprint of the loaded partitions, used as the cache key downstream
+DATA_GENERATION = 0  # bumped every time a dataset is swapped in (initial load or refresh)
+
+# load state: 'idle' -> 'loading' -> 'ready' | 'failed'; the app starts serving while 'loading'
+LOAD_STATE = 'idle'
+LOAD_ERROR = None
+_READY = threading.Event()
+_LOAD_THREAD = None
+_LOAD_THREAD_LOCK = threading.Lock()
+
+# (Origin, Dest, Period) aggregate cubes built once at load time; the trend plots read these
+MONTHLY_CUBE = pd.DataFrame()
+QUARTERLY_CUBE = pd.DataFrame()
+MARKET_CUBE = pd.DataFrame()  # undirected (AirportA, AirportB, Period), derived from QUARTERLY_CUBE
+FARE_HISTOGRAMS = pd.DataFrame()  # sparse (Origin, Dest, quarter, fare bin) counts for percentiles
+FARE_QUANTILES = pd.DataFrame()  # (Origin, Dest, quarter) fare percentiles, derived from FARE_HISTOGRAMS
+
+# secondary indexes for the airport / carrier drilldowns
+CARRIER_CUBE = pd.DataFrame()  # (Carrier, Origin, Dest, quarter) cells indexed by Carrier
+CARRIER_HISTOGRAMS = pd.DataFrame()  # sparse (Carrier, quarter, fare bin) counts indexed by Carrier
+AIRPORT_CUBE = pd.DataFrame()  # (Airport, Other, quarter) indexed by Airport, derived from QUARTERLY_CUBE
+AIRPORT_CARRIER_CUBE = pd.DataFrame()  # (Airport, Carrier, quarter) indexed by Airport, derived from CARRIER_CUBE
+
+# index columns of every frame stored as a cube (the shared store keeps them as plain columns)
+CUBE_INDEX = {
+    'monthly': ['Origin', 'Dest'],
+    'quarterly': ['Origin', 'Dest'],
+    'fare_hist': ['Origin', 'Dest'],
+    'carrier': [aggregates.CARRIER_KEY],
+    'carrier_hist': [aggregates.CARRIER_KEY],
+}
+
+# what the resident dataset was built from, so refresh_data() can tell new partitions apart
+_DATA_PATH = None
+_LOADED_SIGNATURES = {}  # partition path -> fingerprint at load time
+_SWAP_LOCK = threading.Lock()
+_REFRESH_LOCK = threading.Lock()
+
+# called with the new DATA_VERSION after every swap (initial load and refreshes)
+_INSTALL_LISTENERS = []
 
 # 1. data loading function
+
+def _add_time_col(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    derive the per-ticket date used by the monthly fare trend.
+    raw DB1B rows only carry Year / Quarter, so each ticket is assigned a day inside
+    its quarter from a hash of its ItinID; the date is therefore identical no matter
+    which subset of rows a query returns.
+    """
+    quarter_start = pd.to_datetime(
+        pd.DataFrame({'year': df['Year'], 'month': df['Quarter'] * 3 - 2, 'day': 1})
+    )
+    days_in_quarter = ((quarter_start + pd.DateOffset(months=3)) - quarter_start).dt.days
+
+    itin_hash = df[ID_COL].to_numpy(dtype=np.uint64) * np.uint64(2654435761)
+    day_offset = itin_hash % days_in_quarter.to_numpy(dtype=np.uint64)
+
+    df[TIME_COL] = quarter_start + pd.to_timedelta(day_offset.astype(np.int64), unit='D')
+    return df
+
+
+def clean_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    type coercion and derived columns shared by the full load, per-route scans
+    and the offline ETL (src/etl.py).
+    """
+
+    # 1. ensure date column is datetime
+    if TIME_COL in df.columns:
+        df[TIME_COL] = pd.to_datetime(df[TIME_COL])
+    elif ID_COL in df.columns:
+        df = _add_time_col(df)
+
+    # 2. key numeric columns type conversion
+    for col in [PASSENGER_COL, FARE_COL]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+            if col == PASSENGER_COL:
+                df[col] = df[col].fillna(0).astype(np.int64)
+
+    return df
+
+
+def _compact(df: pd.DataFrame, airports=None) -> pd.DataFrame:
+    """convert scanned rows to the compact schema before they are aggregated"""
+
+    # Origin / Dest share one category list so their codes are comparable
+    if airports is None:
+        airports = np.union1d(df['Origin'].dropna().unique(), df['Dest'].dropna().unique())
+    for col in ['Origin', 'Dest']:
+        df[col] = pd.Categorical(df[col], categories=airports)
+
+    for col, dtype in COMPACT_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+
+    return df
+
+
+def _memory_report(frames: dict):
+    """log the in-memory footprint of the resident cubes"""
+    usage = {name: frame.memory_usage(index=True, deep=True).sum() for name, frame in frames.items()}
+    schema = 'compact' if COMPACT_SCHEMA else 'default'
+    print(f"cube memory: {sum(usage.values()) / 1024 ** 2:.1f} MB ({schema} schema)")
+    for name, nbytes in usage.items():
+        print(f"  {name}: {nbytes / 1024 ** 2:.1f} MB ({len(frames[name])} rows)")
+
+
+def _build_frames(data_path: str) -> dict:
+    """
+    scan, clean and aggregate the dataset; the rows are dropped once the cubes exist.
+    returns the {'monthly', 'quarterly'} cubes, the quarterly {'fare_hist'} histograms and
+    the per-carrier {'carrier', 'carrier_hist'} frames.
+    """
+    df = clean_rows(dataset.scan(columns=LOAD_COLUMNS, data_dir=data_path))
+    df = df.drop(columns=[ID_COL], errors='ignore')
+    print(f"column '{TIME_COL}' confirmed as datetime.")
+
+    frames = _build_cubes(df)
+    print(f"{len(df)} rows aggregated: {len(frames['monthly'])} monthly / {len(frames['quarterly'])} quarterly cells, "
+          f"{len(frames['fare_hist'])} fare histogram bins, {len(frames['carrier'])} carrier cells.")
+    return frames
+
+
+def _build_cubes(df: pd.DataFrame, airports=None) -> dict:
+    """
+    every cube of a set of cleaned rows. the rows are compacted first, so a full
+    load and the partitions merged in by a refresh produce identical dtypes.
+    """
+    if COMPACT_SCHEMA:
+        df = _compact(df, airports)
+
+    frames = {
+        'monthly': aggregates.build_route_cube(df, 'M', FARE_COL, PASSENGER_COL, TIME_COL),
+        'quarterly': aggregates.build_route_cube(df, 'Q', FARE_COL, PASSENGER_COL),
+        'fare_hist': aggregates.build_fare_histograms(df, FARE_COL),
+    }
+    frames.update(_build_carrier_frames(df))
+    return frames
+
+
+def _build_carrier_frames(df: pd.DataFrame) -> dict:
+    """
+    carrier cube and per-carrier fare histograms (empty when no row has a carrier).
+    partitions name the carrier column differently, so each row takes the first
+    of CARRIER_COLS that is set on it.
+    """
+    present = [col for col in CARRIER_COLS if col in df.columns]
+    carrier = df[present[0]] if present else pd.Series(np.nan, index=df.index)
+    for col in present[1:]:
+        carrier = carrier.fillna(df[col])
+    if carrier.isna().all():
+        return {'carrier': pd.DataFrame(), 'carrier_hist': pd.DataFrame()}
+
+    df = df.assign(**{aggregates.CARRIER_KEY: carrier})
+    key = aggregates.CARRIER_KEY
+    return {
+        'carrier': aggregates.build_carrier_cube(df, key, FARE_COL, PASSENGER_COL),
+        'carrier_hist': aggregates.build_fare_histograms(df, FARE_COL, {key: key}),
+    }
+
+
+def _load_shared_frames(version: str, build) -> dict:
+    """
+    attach to the frames another worker already published for version, or
+    build them with build() and publish them (under a host-wide lock) when this
+    is the first worker.
+    """
+    cubes = list(CUBE_INDEX)
+    # keyed by layout too, so a build with other cube columns never attaches files
+    # an older build published for the same data
+    key = f"{version}-l{SHARED_LAYOUT}"
+
+    with shared_store.build_lock(key):
+        shared = shared_store.attach(key, cubes, CUBE_INDEX)
+        if shared is None:
+            frames = build()
+            shared_store.publish(key, {name: frame.reset_index() for name, frame in frames.items()})
+            # re-attach so this worker also reads the shared pages instead of a private copy
+            shared = shared_store.attach(key, cubes, CUBE_INDEX)
+        print(f"attached to shared dataset {key} in {shared_store.SHARED_DIR}.")
+    return shared
+
+
+def _install(frames: dict, partitions, version: str, data_path: str):
+    """
+    swap a fully built dataset in.
+    everything is prepared before the lock is taken, and the globals are then
+    rebound together, with DATA_VERSION last: a request running during the swap
+    reads either the old frames or the new ones, never a half-merged frame, and
+    caches keyed on DATA_VERSION only see the new key once the new data is live.
+    """
+    global PARTITIONS, DATA_VERSION, DATA_GENERATION, MONTHLY_CUBE, QUARTERLY_CUBE
+    global MARKET_CUBE, FARE_HISTOGRAMS, FARE_QUANTILES, CARRIER_CUBE, CARRIER_HISTOGRAMS, AIRPORT_CUBE, AIRPORT_CARRIER_CUBE
+    global _DATA_PATH, _LOADED_SIGNATURES
+
+    market_cube = aggregates.build_market_cube(frames['quarterly'])
+    airport_cube = aggregates.build_airport_cube(frames['quarterly'])
+    airport_carrier_cube = aggregates.build_airport_carrier_cube(frames['carrier'])
+    fare_quantiles = timeseries.histogram_percentiles(
+        frames['fare_hist'].reset_index(), 'Q', by=['Origin', 'Dest']
+    ).set_index(['Origin', 'Dest'])
+    signatures = {path: dataset.fingerprint([(year, quarter, path)]) for year, quarter, path in partitions}
+
+    # forecasts are trained (or read back) once per data version, never per request
+    try:
+        forecast.load_or_train(version, frames['quarterly'])
+    except Exception as e:
+        print(f"forecast training failed, forecast view disabled: {e}")
+
+    with _SWAP_LOCK:
+        MONTHLY_CUBE, QUARTERLY_CUBE, MARKET_CUBE = frames['monthly'], frames['quarterly'], market_cube
+        FARE_HISTOGRAMS, FARE_QUANTILES = frames['fare_hist'], fare_quantiles
+        CARRIER_CUBE, CARRIER_HISTOGRAMS = frames['carrier'], frames['carrier_hist']
+        AIRPORT_CUBE, AIRPORT_CARRIER_CUBE = airport_cube, airport_carrier_cube
+        PARTITIONS, _DATA_PATH, _LOADED_SIGNATURES = partitions, data_path, signatures
+        DATA_GENERATION += 1
+        DATA_VERSION = version
+
+    for listener in _INSTALL_LISTENERS:
+        try:
+            listener(version)
+        except Exception as e:
+            print(f"install listener {getattr(listener, '__name__', listener)} failed: {e}")
+
+
+def add_install_listener(listener):
+    """run listener(version) every time a dataset is swapped in (it should not block)"""
+    if listener not in _INSTALL_LISTENERS:
+        _INSTALL_LISTENERS.append(listener)
+
+
 def load_data():
     """
-    load cleaned_flight_data.parquet and prepare basic data.
-    enhanced with error handling and type conversion robustness.
+    load the Year/Quarter-partitioned dataset (the ETL output when it has been built,
+    parquet_data/ otherwise) and prepare basic data.
+    only LOAD_COLUMNS are read, and the rows are aggregated into the cubes and
+    dropped: every view and the api read the cubes, never the rows.
+    with FLIGHT_SHARED_MEMORY=1 the result is materialized once per host as
+    memory-mapped Arrow files that every worker attaches to.
     """
-    global DF_DATA 
+    global LOAD_STATE, LOAD_ERROR
     
-    data_path = 'cleaned_flight_data.parquet'
+    data_path = dataset.default_data_dir()
     print(f"loading flight data from {data_path}...")
+    LOAD_STATE, LOAD_ERROR = 'loading', None
     
     try:
-        df = pd.read_parquet(data_path)
-        
-        ## data cleaning and preparation
-        
-        # 1. ensure date column is datetime
-        if TIME_COL in df.columns:
-            df[TIME_COL] = pd.to_datetime(df[TIME_COL])
-            print(f"column '{TIME_COL}' confirmed as datetime.")
-        else:
-            print(f"ERROR: date column '{TIME_COL}' not found. cannot proceed with time series analysis.")
+        partitions = dataset.list_partitions(data_path)
+        if not partitions:
+            LOAD_STATE, LOAD_ERROR = 'failed', f"no partitions found in {data_path}"
+            print(f"ERROR: no db1b_market_<year>_<q>.parquet partitions found in {data_path}!")
             return
 
-        # 2. key numeric columns type conversion
-        for col in [PASSENGER_COL, FARE_COL]:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-                if col == PASSENGER_COL:
-                    df[col] = df[col].fillna(0).astype(np.int64)
-            
-        # 3. create route column (origin-dest)
-        if 'Origin' in df.columns and 'Dest' in df.columns:
-            df[ROUTE_COL] = df['Origin'] + '-' + df['Dest']
-        else:
-            print("ERROR: 'Origin' and 'Dest' columns not found. cannot create 'Route' column.")
+        missing = [col for col in ['Year', 'Quarter', 'Origin', 'Dest'] if col not in dataset.schema_names(data_path)]
+        if missing:
+            LOAD_STATE, LOAD_ERROR = 'failed', f"missing columns {missing}"
+            print(f"ERROR: required columns {missing} not found. cannot proceed with route analysis.")
             return
-            
-        DF_DATA = df
-        print(f"data loaded successfully. total rows: {len(df)}")
+
+        version = dataset.fingerprint(partitions)
+        print(f"found {len(partitions)} partitions "
+              f"({partitions[0][0]}Q{partitions[0][1]} - {partitions[-1][0]}Q{partitions[-1][1]}), "
+              f"data version {version}.")
+
+        if SHARED_MEMORY:
+            frames = _load_shared_frames(version, lambda: _build_frames(data_path))
+        else:
+            frames = _build_frames(data_path)
+
+        print(f"data loaded successfully. total rows: {int(frames['quarterly'][aggregates.ROW_COUNT].sum())}")
+        _memory_report(frames)
+
+        _install(frames, partitions, version, data_path)
+
+        LOAD_STATE = 'ready'
+        _READY.set()
         
     except FileNotFoundError:
+        LOAD_STATE, LOAD_ERROR = 'failed', f"{data_path} not found"
         print(f"ERROR: {data_path} not found!")
     except Exception as e:
+        LOAD_STATE, LOAD_ERROR = 'failed', str(e)
         print(f"an error occurred during data loading: {e}")
 
-# 2. load data at app startup
-load_data()
 
+# 2. lazy, non-blocking startup
+
+def start_background_load():
+    """
+    run load_data() on a daemon thread so the app can serve its layout and
+    health routes immediately; repeated calls do not start a second load.
+    """
+    global _LOAD_THREAD
+
+    with _LOAD_THREAD_LOCK:
+        if _LOAD_THREAD is None or (not _LOAD_THREAD.is_alive() and LOAD_STATE == 'failed'):
+            _LOAD_THREAD = threading.Thread(target=load_data, name='data-warmup', daemon=True)
+            _LOAD_THREAD.start()
+    return _LOAD_THREAD
+
+
+def is_ready() -> bool:
+    return _READY.is_set()
+
+
+def wait_until_ready(timeout: float = None) -> bool:
+    """start the load if needed and block until it is done (for scripts and tests)"""
+    start_background_load()
+    _LOAD_THREAD.join(timeout)
+    return is_ready()
+
+
+def load_status() -> dict:
+    """readiness summary used by the /readyz route and the warming-up view"""
+    return {
+        'state': LOAD_STATE,
+        'version': DATA_VERSION,
+        'generation': DATA_GENERATION,
+        'partitions': len(PARTITIONS),
+        'rows': int(QUARTERLY_CUBE[aggregates.ROW_COUNT].sum()) if not QUARTERLY_CUBE.empty else 0,
+        'error': LOAD_ERROR,
+    }
+
+
+def snapshot(*names):
+    """
+    (DATA_VERSION, frames) for the named globals, read together under the swap
+    lock so the frames always belong to the returned version (e.g. for ETags).
+    """
+    with _SWAP_LOCK:
+        return DATA_VERSION, [globals()[name] for name in names]
+
+
+def airport_markets(code: str) -> pd.DataFrame:
+    """all markets touching an airport, busiest first (see aggregates.airport_markets)"""
+    return aggregates.airport_markets(AIRPORT_CUBE, code)
+
+
+# 3. incremental refresh
+
+def _merge_cube(cube: pd.DataFrame, new_cells: pd.DataFrame, airports=None) -> pd.DataFrame:
+    """add the cells of new partitions to a cube (the periods do not overlap)"""
+    if new_cells.empty:
+        return cube
+    if cube.empty:
+        return new_cells
+    index = list(new_cells.index.names)
+    merged = pd.concat([cube.reset_index(), new_cells.reset_index()], ignore_index=True)
+    if airports is not None:
+        for col in ['Origin', 'Dest']:
+            if col in merged.columns:
+                merged[col] = pd.Categorical(merged[col], categories=airports)
+    order = index + [col for col in ['Origin', 'Dest'] if col in merged.columns and col not in index]
+    merged = merged.sort_values(order + [PERIOD_COL], kind='stable', ignore_index=True)
+    return merged.set_index(index)
+
+
+def _cube_airports(cube: pd.DataFrame) -> np.ndarray:
+    """every airport code in a route cube's (Origin, Dest) index"""
+    if cube.empty:
+        return np.array([], dtype=object)
+    return np.union1d(
+        cube.index.get_level_values('Origin').unique().astype(str),
+        cube.index.get_level_values('Dest').unique().astype(str),
+    )
+
+
+def _merge_partitions(data_path: str, added) -> dict:
+    """
+    frames for the resident dataset plus the added partitions.
+    only the added files are scanned; their cells are appended to the cubes. the
+    result is identical to a full reload of the same partitions, carrier cubes
+    included (benchmarks/refresh_consistency.py checks this).
+    """
+    new_rows = pd.concat(
+        [dataset.scan(columns=LOAD_COLUMNS, years=[year], quarters=[quarter], data_dir=data_path)
+         for year, quarter, _ in added],
+        ignore_index=True,
+    )
+    new_rows = clean_rows(new_rows).drop(columns=[ID_COL], errors='ignore')
+
+    airports = None
+    if COMPACT_SCHEMA:
+        # widen the shared airport categories when the new quarters bring new airports
+        airports = np.union1d(
+            _cube_airports(QUARTERLY_CUBE),
+            np.union1d(new_rows['Origin'].dropna().unique(), new_rows['Dest'].dropna().unique()),
+        )
+
+    # same path as a full load (compact, then aggregate), so the merged cells keep the cube dtypes
+    new_cells = _build_cubes(new_rows, airports)
+    current = {'monthly': MONTHLY_CUBE, 'quarterly': QUARTERLY_CUBE, 'fare_hist': FARE_HISTOGRAMS,
+               'carrier': CARRIER_CUBE, 'carrier_hist': CARRIER_HISTOGRAMS}
+    frames = {name: _merge_cube(current[name], new_cells[name], airports) for name in CUBE_INDEX}
+
+    print(f"merged {len(new_rows)} rows from {len(added)} new partitions.")
+    return frames
+
+
+def refresh_data() -> dict:
+    """
+    pick up partitions that appeared since the last load, without a restart.
+    new quarters are scanned on their own and their cells merged into the cubes.
+    any other change (a rewritten or removed partition, or the ETL output
+    appearing) falls back to a full rebuild in the background.
+    either way the current dataset keeps serving requests until the new one is
+    swapped in by _install().
+    """
+    with _REFRESH_LOCK:
+        if not is_ready():
+            return {'status': LOAD_STATE, 'version': DATA_VERSION}
+
+        data_path = dataset.default_data_dir()
+        partitions = dataset.list_partitions(data_path)
+        if not partitions:
+            return {'status': 'unchanged', 'version': DATA_VERSION}
+        version = dataset.fingerprint(partitions)
+        if version == DATA_VERSION:
+            return {'status': 'unchanged', 'version': DATA_VERSION}
+
+        current = {path for _, _, path in partitions}
+        loaded_quarters = {(year, quarter) for year, quarter, _ in PARTITIONS}
+        added = [(year, quarter, path) for year, quarter, path in partitions if path not in _LOADED_SIGNATURES]
+        incremental = (
+            data_path == _DATA_PATH
+            and bool(added)
+            and all(path in current for path in _LOADED_SIGNATURES)
+            and all(
+                dataset.fingerprint([(year, quarter, path)]) == _LOADED_SIGNATURES[path]
+                for year, quarter, path in partitions if path in _LOADED_SIGNATURES
+            )
+            and not any((year, quarter) in loaded_quarters for year, quarter, _ in added)
+        )
+
+        if incremental:
+            build = lambda: _merge_partitions(data_path, added)
+        else:
+            build = lambda: _build_frames(data_path)
+
+        print(f"refreshing data version {DATA_VERSION} -> {version} "
+              f"({'incremental, ' + str(len(added)) + ' new partitions' if incremental else 'full rebuild'})...")
+        frames = _load_shared_frames(version, build) if SHARED_MEMORY else build()
+        _install(frames, partitions, version, data_path)
+        print(f"data version {version} is live (generation {DATA_GENERATION}).")
+
+        return {
+            'status': 'incremental' if incremental else 'rebuilt',
+            'version': version,
+            'generation': DATA_GENERATION,
+            'added': [f"{year}Q{quarter}" for year, quarter, _ in added],
+        }
+
+
+# 4. average fare trend plot function
+
+TREND_STATS = ('rolling', 'yoy', 'percentiles')
+
+
+def _add_yoy_bars(fig, x, change, name: str):
+    """year-over-year change as bars on a secondary (percent) y axis"""
+    fig.add_trace(go.Bar(
+        x=x, y=change, name=name, yaxis='y2', opacity=0.35,
+        marker_color=np.where(np.nan_to_num(change) >= 0, 'rgb(44,160,44)', 'rgb(214,39,40)'),
+    ))
+    fig.update_layout(yaxis2=dict(title="year-over-year change", overlaying='y', side='right',
+                                  tickformat='.0%', showgrid=False))
 
-# 3. average fare trend plot function
 
-def generate_fare_trend_plot(route: str):
+def generate_fare_trend_plot(route: str, granularity: str = None, stats=()):
     """
     generate average fare trend plot (option 1: fare-trend).
-    aggregates data monthly and plots a line chart.
+    reads the route's cells from the monthly (or, for quarterly / yearly
+    granularity, the quarterly) cube and rolls them up with src/timeseries.py.
+    stats may add a rolling mean, year-over-year change and fare percentiles
+    (from the quarterly fare histograms, so not at monthly granularity).
     """
     
-    if DF_DATA.empty:
+    if MONTHLY_CUBE.empty:
         return go.Figure().update_layout(title="no data loaded.")
 
+    granularity = granularity or 'M'
     origin, dest = route.split('-')
     
-    # 1. filter data for specific route
-    route_df = DF_DATA.query("Origin == @origin and Dest == @dest").copy()
+    # 1. look up the route's aggregates
+    with span('filter'):
+        route_df = aggregates.route_rows(MONTHLY_CUBE if granularity == 'M' else QUARTERLY_CUBE, origin, dest)
     
     if route_df.empty:
         return go.Figure().update_layout(title=f"no data found for route: {route}")
 
-    # 2. aggregate by month and compute average fare
-    agg_df = route_df.set_index(TIME_COL).resample('M')[FARE_COL].mean().reset_index()
-    agg_df.rename(columns={FARE_COL: 'AvgFare'}, inplace=True)
+    # 2. average fare per period, keeping empty periods as gaps
+    with span('aggregate'):
+        series = timeseries.rollup(route_df, granularity)
+        agg_df = pd.DataFrame({TIME_COL: series[PERIOD_COL], 'AvgFare': series[FARE_MEAN]})
+
+        if 'rolling' in stats:
+            window = timeseries.ROLLING_WINDOWS[granularity]
+            agg_df['Rolling'] = timeseries.rolling_mean(series, FARE_MEAN, window)
+        if 'yoy' in stats:
+            agg_df['YoY'] = timeseries.yoy_change(series, FARE_MEAN, granularity)
+
+        percentiles = None
+        if 'percentiles' in stats and granularity == 'Q':
+            percentiles = aggregates.route_rows(FARE_QUANTILES, origin, dest)
+        elif 'percentiles' in stats and granularity == 'Y':
+            percentiles = timeseries.histogram_percentiles(
+                aggregates.route_rows(FARE_HISTOGRAMS, origin, dest), granularity
+            )
     
     # 3. create plotly line chart
-    fig = px.line(
-        agg_df, 
-        x=TIME_COL, 
-        y='AvgFare',
-        title=f"market fare trend: {origin} → {dest} (monthly average)",
-    )
-    
-    fig.update_traces(mode='lines+markers', marker=dict(size=4))
-    fig.update_layout(
-        xaxis_title="date", 
-        yaxis_title="average fare ($)", 
-        template="plotly_white",
-        hovermode="x unified"
-    )
+    with span('figure'):
+        fig = px.line(
+            agg_df, 
+            x=TIME_COL, 
+            y='AvgFare',
+            title=f"market fare trend: {origin} → {dest} ({timeseries.GRANULARITIES[granularity]} average)",
+        )
+        
+        fig.update_traces(mode='lines+markers', marker=dict(size=4), name='average fare', showlegend=bool(stats))
+
+        if percentiles is not None and not percentiles.empty:
+            # interquartile band plus the 10th / 90th percentiles and the median
+            fig.add_trace(go.Scatter(
+                x=list(percentiles[PERIOD_COL]) + list(percentiles[PERIOD_COL][::-1]),
+                y=list(percentiles['p75']) + list(percentiles['p25'][::-1]),
+                fill='toself', fillcolor='rgba(99,110,250,0.15)', line=dict(width=0),
+                hoverinfo='skip', name='25th-75th percentile',
+            ))
+            for col, name, dash in [('p10', '10th percentile', 'dot'), ('p50', 'median', 'dash'), ('p90', '90th percentile', 'dot')]:
+                fig.add_trace(go.Scatter(
+                    x=percentiles[PERIOD_COL], y=percentiles[col], mode='lines', name=name,
+                    line=dict(dash=dash, width=1, color='rgb(99,110,250)'),
+                ))
+
+        if 'Rolling' in agg_df:
+            fig.add_trace(go.Scatter(
+                x=agg_df[TIME_COL], y=agg_df['Rolling'], mode='lines',
+                name=f"{window}-period rolling mean", line=dict(color='rgb(255,127,14)'),
+            ))
+        if 'YoY' in agg_df:
+            _add_yoy_bars(fig, agg_df[TIME_COL], agg_df['YoY'], 'YoY change (average fare)')
+
+        if 'percentiles' in stats and granularity == 'M':
+            fig.update_layout(title=fig.layout.title.text + "<br><sup>percentiles need quarterly or yearly granularity</sup>")
+
+        fig.update_layout(
+            xaxis_title="date", 
+            yaxis_title="average fare ($)", 
+            template="plotly_white",
+            hovermode="x unified"
+        )
     
     return fig
 
 
-# 4. passenger volume trend plot function
+# 5. passenger volume trend plot function
 
-def generate_passenger_volume_plot(route: str):
+def generate_passenger_volume_plot(route: str, granularity: str = None, stats=()):
     """
     generate total passenger volume trend plot (option 2: volume-trend).
-    aggregates bidirectional route data and sums quarterly.
+    reads both directions of the route from one MARKET_CUBE row set (or, at
+    monthly granularity, from the monthly cube) and rolls them up with
+    src/timeseries.py; stats may add a rolling mean and year-over-year change.
     """
     
-    if DF_DATA.empty:
+    if MARKET_CUBE.empty:
         return px.scatter(title="no data loaded.")
 
+    granularity = granularity or 'Q'
     origin, dest = route.split('-')
 
-    # 1. bidirectional filter: aggregate both directions (origin→dest and dest→origin)
-    plot_df = DF_DATA[
-        ((DF_DATA['Origin'] == origin) & (DF_DATA['Dest'] == dest)) |
-        ((DF_DATA['Origin'] == dest) & (DF_DATA['Dest'] == origin))
-    ].copy()
+    # 1. bidirectional lookup: both directions (origin→dest and dest→origin) of the market
+    with span('filter'):
+        if granularity == 'M':
+            plot_df = aggregates.routes_rows(MONTHLY_CUBE, [(origin, dest), (dest, origin)])
+        else:
+            plot_df = aggregates.market_directions(MARKET_CUBE, origin, dest)
 
     if plot_df.empty:
         return px.scatter(title=f"no passenger data available for route: {route}")
         
     try:
-        # 2. aggregate by year, quarter, and direction
-        grouped_df = plot_df.groupby(['Year', 'Quarter', 'Origin', 'Dest'])[PASSENGER_COL].sum().reset_index()
-        
-        # 3. create timepoint (first day of quarter) as x-axis
-        grouped_df['TimePoint'] = pd.to_datetime(
-            grouped_df['Year'].astype(str) + '-' +
-            (grouped_df['Quarter'] * 3 - 2).astype(str) + '-01'
-        )
-        
-        # 4. create route identifier and rename aggregated column
-        grouped_df[ROUTE_COL] = grouped_df['Origin'] + '-' + grouped_df['Dest']
-        sum_col_name = 'Total_Passengers_Sum'
-        grouped_df.rename(columns={PASSENGER_COL: sum_col_name}, inplace=True)
+        with span('aggregate'):
+            # 2. totals per direction and period, start of the period as x-axis
+            grouped_df = timeseries.rollup(plot_df[['Origin', 'Dest', PERIOD_COL, PASSENGER_SUM]], granularity, by=['Origin', 'Dest'])
+            grouped_df = grouped_df.sort_values([PERIOD_COL, 'Origin', 'Dest'], ignore_index=True)
+            grouped_df = grouped_df.rename(columns={PERIOD_COL: 'TimePoint'})
+            
+            # 3. create route identifier and rename aggregated column
+            grouped_df[ROUTE_COL] = grouped_df['Origin'].astype(str) + '-' + grouped_df['Dest'].astype(str)
+            sum_col_name = 'Total_Passengers_Sum'
+            grouped_df.rename(columns={PASSENGER_SUM: sum_col_name}, inplace=True)
+
+            if 'rolling' in stats:
+                window = timeseries.ROLLING_WINDOWS[granularity]
+                grouped_df['Rolling'] = timeseries.rolling_mean(grouped_df, sum_col_name, window, by=[ROUTE_COL])
+            if 'yoy' in stats:
+                # year-over-year change of the market (both directions together)
+                market = grouped_df.groupby('TimePoint', sort=True)[sum_col_name].sum().reset_index()
+                market['YoY'] = timeseries.yoy_change(market, sum_col_name, granularity)
         
     except KeyError as e:
         return px.scatter(title=f"data error: missing required column for time series grouping ({e})")
 
-    # 5. create plotly line chart
-    fig = px.line(
-        grouped_df,
-        x='TimePoint',
-        y=sum_col_name, 
-        color=ROUTE_COL,
-        title=f'quarterly total passenger volume trend for {route}',
-        labels={
-            'TimePoint': 'quarter',
-            sum_col_name: 'total passengers (sum)',
-            ROUTE_COL: 'route direction'
-        },
-        template='plotly_white'
-    )
+    # 4. create plotly line chart
+    with span('figure'):
+        fig = px.line(
+            grouped_df,
+            x='TimePoint',
+            y=sum_col_name, 
+            color=ROUTE_COL,
+            title=f'{timeseries.GRANULARITIES[granularity]} total passenger volume trend for {route}',
+            labels={
+                'TimePoint': timeseries.PERIOD_NAMES[granularity],
+                sum_col_name: 'total passengers (sum)',
+                ROUTE_COL: 'route direction'
+            },
+            template='plotly_white'
+        )
 
-    fig.update_yaxes(
-        tickformat=',.0f',
-        title='total passengers (sum)'
-    )
-    
-    fig.update_layout(
-        xaxis_title=None,
-        legend_title='route direction',
-        hovermode="x unified"
-    )
+        if 'Rolling' in grouped_df:
+            for direction, rows in grouped_df.groupby(ROUTE_COL, sort=False):
+                fig.add_trace(go.Scatter(
+                    x=rows['TimePoint'], y=rows['Rolling'], mode='lines', line=dict(dash='dash'),
+                    name=f"{direction} ({window}-period rolling mean)",
+                ))
+        fig.update_yaxes(
+            tickformat=',.0f',
+            title='total passengers (sum)'
+        )
+
+        if 'yoy' in stats:
+            _add_yoy_bars(fig, market['TimePoint'], market['YoY'], 'YoY change (both directions)')
+        
+        fig.update_layout(
+            xaxis_title=None,
+            legend_title='route direction',
+            hovermode="x unified"
+        )
 
     return fig
 
 
 
-# 5. price forecast plot function (placeholder)
+# 6. price forecast plot function
 
 def generate_price_forecast_plot(route: str):
-    """price forecast (option 3) - pending implementation"""
-    return go.Figure().update_layout(
-        title=f"price forecast: {route} - model integration pending",
-        annotations=[
-            dict(
-                text="next, your price prediction model will be integrated here.",
-                xref="paper", yref="paper",
-                showarrow=False,
-                font=dict(size=14, color="gray")
-            )
-        ]
-    )
+    """
+    generate price forecast plot (option 3: price-forecast).
+    quarterly average fare history from QUARTERLY_CUBE plus the route's
+    pre-trained forecast (see src/forecast.py); nothing is fitted here.
+    """
+
+    if QUARTERLY_CUBE.empty:
+        return go.Figure().update_layout(title="no data loaded.")
+
+    origin, dest = route.split('-')
+    with span('filter'):
+        model = forecast.get_forecast(route)
+        history = aggregates.route_rows(QUARTERLY_CUBE, origin, dest)
+
+    if model is None or history.empty:
+        return go.Figure().update_layout(title=f"no forecast available for route: {route}")
+
+    with span('figure'):
+        # 1. observed quarterly average fare
+        history = history.sort_values(PERIOD_COL)
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=history[PERIOD_COL], y=history[FARE_MEAN],
+            mode='lines+markers', name='observed', marker=dict(size=4),
+        ))
+
+        # 2. forecast with its 95% band, joined to the last observed quarter
+        future = forecast.quarter_start(model['t'])
+        fig.add_trace(go.Scatter(
+            x=list(future) + list(future[::-1]),
+            y=model['upper'] + model['lower'][::-1],
+            fill='toself', fillcolor='rgba(255,127,14,0.15)', line=dict(width=0),
+            hoverinfo='skip', name='95% interval',
+        ))
+        fig.add_trace(go.Scatter(
+            x=[history[PERIOD_COL].iloc[-1]] + list(future),
+            y=[history[FARE_MEAN].iloc[-1]] + model['fare'],
+            mode='lines+markers', name=f"forecast ({model['model']})",
+            line=dict(dash='dash', color='rgb(255,127,14)'), marker=dict(size=4),
+        ))
+
+        title = f"price forecast: {origin} → {dest} (next {len(model['t'])} quarters)"
+        backtest = model['backtest']
+        if backtest:
+            title += (f"<br><sup>backtest on last {backtest['quarters']} quarters: "
+                      f"trend+season MAE ${backtest['trend_mae']:.2f}, "
+                      f"seasonal-naive MAE ${backtest['baseline_mae']:.2f}, "
+                      f"serving {model['model']} (MAPE {backtest['mape']:.1%})</sup>")
+
+        fig.update_layout(
+            title=title,
+            xaxis_title="quarter",
+            yaxis_title="average fare ($)",
+            template="plotly_white",
+            hovermode="x unified",
+        )
+
+    return fig
+
+
+# 7. route comparison plot function
+
+def parse_routes(routes) -> list:
+    """'ORIGIN-DEST' strings -> unique (origin, dest) pairs, in the given order"""
+    pairs = []
+    for route in routes or []:
+        origin, _, dest = str(route).partition('-')
+        if origin and dest and (origin, dest) not in pairs:
+            pairs.append((origin, dest))
+    return pairs
+
+
+def generate_route_comparison_plot(routes):
+    """
+    generate the multi-route comparison plot (option 6: route-comparison).
+    quarterly average fare and passengers of every selected route, read from
+    QUARTERLY_CUBE in one batched lookup and drawn as one figure (fare on top,
+    volume below, one color per route).
+    """
+
+    if QUARTERLY_CUBE.empty:
+        return go.Figure().update_layout(title="no data loaded.")
+
+    pairs = parse_routes(routes)
+
+    # 1. one index lookup for all routes
+    with span('filter'):
+        cells = aggregates.routes_rows(QUARTERLY_CUBE, pairs)
+
+    if cells.empty:
+        return go.Figure().update_layout(title="no data found for the selected routes.")
+
+    # 2. route x quarter tables for both metrics
+    with span('aggregate'):
+        cells[ROUTE_COL] = cells['Origin'] + '-' + cells['Dest']
+        wide = cells.pivot_table(
+            index=PERIOD_COL, columns=ROUTE_COL, values=[FARE_MEAN, PASSENGER_SUM],
+            aggfunc='first', observed=True,
+        ).sort_index()
+        found = [f"{origin}-{dest}" for origin, dest in pairs if f"{origin}-{dest}" in wide[FARE_MEAN].columns]
+
+    # 3. stacked subplots sharing the quarter axis
+    with span('figure'):
+        fig = make_subplots(
+            rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+            subplot_titles=("average fare ($)", "total passengers (sum)"),
+        )
+        colors = px.colors.qualitative.Plotly
+        for i, route in enumerate(found):
+            color = colors[i % len(colors)]
+            for row, col in [(1, FARE_MEAN), (2, PASSENGER_SUM)]:
+                fig.add_trace(go.Scatter(
+                    x=wide.index, y=wide[col][route],
+                    mode='lines+markers', marker=dict(size=4), line=dict(color=color),
+                    name=route.replace('-', ' → '), legendgroup=route, showlegend=(row == 1),
+                ), row=row, col=1)
+
+        missing = len(pairs) - len(found)
+        title = f"route comparison: {len(found)} routes (quarterly)"
+        if missing:
+            title += f"<br><sup>{missing} selected route(s) have no data</sup>"
+
+        fig.update_yaxes(tickformat=',.0f', row=2, col=1)
+        fig.update_layout(
+            title=title,
+            template="plotly_white",
+            hovermode="x unified",
+            legend_title="route",
+            height=700,
+        )
+
+    return fig
+
+
+# 8. airport hub and carrier drilldowns (read from the secondary indexes)
+
+DRILLDOWN_TOP = 15  # routes / carriers shown in the ranking bars
+
+
+def generate_airport_hub_plot(code: str):
+    """
+    generate the airport hub drilldown (option 7: airport-hub).
+    one seek into AIRPORT_CUBE and one into AIRPORT_CARRIER_CUBE: the busiest
+    markets of the airport by direction, the carriers' passenger share with their
+    average fare, and the airport's quarterly passengers and average fare.
+    """
+
+    if AIRPORT_CUBE.empty:
+        return go.Figure().update_layout(title="no data loaded.")
+
+    # 1. index seeks
+    with span('filter'):
+        cells = aggregates.key_rows(AIRPORT_CUBE, code)
+        carrier_cells = aggregates.key_rows(AIRPORT_CARRIER_CUBE, code)
+
+    if cells.empty:
+        return go.Figure().update_layout(title=f"no data found for airport {code}.")
+
+    # 2. rankings and the quarterly series
+    with span('aggregate'):
+        markets = aggregates.airport_markets(AIRPORT_CUBE, code).head(DRILLDOWN_TOP).iloc[::-1]
+        quarterly = timeseries.rollup(cells, 'Q')
+
+        carriers = pd.DataFrame()
+        if not carrier_cells.empty:
+            carriers = carrier_cells.groupby(aggregates.CARRIER_KEY)[[PASSENGER_SUM, aggregates.FARE_SUM, aggregates.FARE_COUNT]].sum()
+            carriers['share'] = carriers[PASSENGER_SUM] / carriers[PASSENGER_SUM].sum()
+            carriers[FARE_MEAN] = carriers[aggregates.FARE_SUM] / carriers[aggregates.FARE_COUNT].where(carriers[aggregates.FARE_COUNT] > 0)
+            carriers = carriers.sort_values(PASSENGER_SUM, ascending=False).head(DRILLDOWN_TOP).iloc[::-1]
+
+    # 3. rankings on top, quarterly trend below
+    with span('figure'):
+        fig = make_subplots(
+            rows=2, cols=2, vertical_spacing=0.12, horizontal_spacing=0.12,
+            specs=[[{}, {}], [{'colspan': 2, 'secondary_y': True}, None]],
+            subplot_titles=(
+                f"top {len(markets)} markets (passengers)", "carrier share of passengers (known carriers)",
+                "quarterly passengers and average fare",
+            ),
+        )
+        labels = code + ' ↔ ' + markets['Other'].astype(str)
+        for col, name, color in [('Outbound', f"from {code}", '#1f77b4'), ('Inbound', f"to {code}", '#aec7e8')]:
+            fig.add_trace(go.Bar(
+                x=markets[col], y=labels, orientation='h', name=name, marker_color=color,
+            ), row=1, col=1)
+
+        if not carriers.empty:
+            fig.add_trace(go.Bar(
+                x=carriers['share'], y=carriers.index.astype(str), orientation='h',
+                name="carrier share", marker_color='#2ca02c', showlegend=False,
+                text=[f"${fare:,.0f}" if pd.notna(fare) else "" for fare in carriers[FARE_MEAN]],
+                textposition='auto',
+                hovertemplate="%{y}: %{x:.1%} of passengers, average fare %{text}<extra></extra>",
+            ), row=1, col=2)
+
+        fig.add_trace(go.Scatter(
+            x=quarterly[PERIOD_COL], y=quarterly[PASSENGER_SUM],
+            mode='lines+markers', marker=dict(size=4), name="passengers", line=dict(color='#1f77b4'),
+        ), row=2, col=1)
+        fig.add_trace(go.Scatter(
+            x=quarterly[PERIOD_COL], y=quarterly[FARE_MEAN],
+            mode='lines', name="average fare ($)", line=dict(color='#d62728', dash='dot'),
+        ), row=2, col=1, secondary_y=True)
+
+        fig.update_xaxes(tickformat='.0%', row=1, col=2)
+        fig.update_yaxes(tickformat=',.0f', row=2, col=1, secondary_y=False)
+        fig.update_yaxes(tickprefix='$', row=2, col=1, secondary_y=True)
+        fig.update_layout(
+            title=f"airport hub: {code}<br><sup>bar labels show each carrier's average fare</sup>",
+            template="plotly_white",
+            barmode='stack',
+            legend=dict(orientation='h', y=-0.08),
+            height=850,
+        )
+
+    return fig
+
+
+def generate_carrier_plot(carrier: str):
+    """
+    generate the carrier drilldown (option 8: carrier-drilldown).
+    one seek into CARRIER_CUBE and one into CARRIER_HISTOGRAMS: the carrier's share
+    of all passengers with a known carrier per quarter, its busiest routes and its
+    quarterly fare distribution (percentiles from the merged fare histograms).
+    """
+
+    if CARRIER_CUBE.empty:
+        return go.Figure().update_layout(title="no carrier data loaded.")
+
+    # 1. index seeks
+    with span('filter'):
+        cells = aggregates.key_rows(CARRIER_CUBE, carrier)
+        hist_cells = aggregates.key_rows(CARRIER_HISTOGRAMS, carrier)
+
+    if cells.empty:
+        return go.Figure().update_layout(title=f"no data found for carrier {carrier}.")
+
+    # 2. share, route ranking and fare percentiles
+    with span('aggregate'):
+        quarterly = timeseries.rollup(cells, 'Q')
+        # rows without a carrier (partitions missing the column) are left out of the denominator too
+        totals = CARRIER_CUBE.groupby(PERIOD_COL)[PASSENGER_SUM].sum()
+        quarterly['share'] = quarterly[PASSENGER_SUM] / quarterly[PERIOD_COL].map(totals).where(lambda total: total > 0)
+
+        routes = cells.groupby(['Origin', 'Dest'], observed=True)[PASSENGER_SUM].sum()
+        routes = routes.sort_values(ascending=False).head(DRILLDOWN_TOP).iloc[::-1].reset_index()
+        percentiles = timeseries.histogram_percentiles(hist_cells, 'Q')
+
+    # 3. three stacked panels
+    with span('figure'):
+        fig = make_subplots(
+            rows=3, cols=1, vertical_spacing=0.1,
+            subplot_titles=(
+                "share of all passengers (quarterly)", f"top {len(routes)} routes (passengers)",
+                "fare distribution (quarterly percentiles)",
+            ),
+        )
+        fig.add_trace(go.Scatter(
+            x=quarterly[PERIOD_COL], y=quarterly['share'],
+            mode='lines+markers', marker=dict(size=4), name="passenger share",
+        ), row=1, col=1)
+
+        fig.add_trace(go.Bar(
+            x=routes[PASSENGER_SUM], y=routes['Origin'].astype(str) + ' → ' + routes['Dest'].astype(str),
+            orientation='h', name="passengers", marker_color='#1f77b4',
+        ), row=2, col=1)
+
+        if not percentiles.empty:
+            band = dict(mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip')
+            fig.add_trace(go.Scatter(x=percentiles[PERIOD_COL], y=percentiles['p90'], **band), row=3, col=1)
+            fig.add_trace(go.Scatter(
+                x=percentiles[PERIOD_COL], y=percentiles['p10'], fill='tonexty',
+                fillcolor='rgba(214, 39, 40, 0.15)', name="p10 – p90", mode='lines', line=dict(width=0),
+            ), row=3, col=1)
+            for col, dash in [('p25', 'dot'), ('p50', None), ('p75', 'dot')]:
+                fig.add_trace(go.Scatter(
+                    x=percentiles[PERIOD_COL], y=percentiles[col], mode='lines',
+                    name=f"{col} fare", line=dict(color='#d62728', dash=dash),
+                ), row=3, col=1)
+
+        fig.update_yaxes(tickformat='.1%', row=1, col=1)
+        fig.update_xaxes(tickformat=',.0f', row=2, col=1)
+        fig.update_yaxes(tickprefix='$', row=3, col=1)
+        fig.update_layout(
+            title=f"carrier: {carrier}",
+            template="plotly_white",
+            legend=dict(orientation='h', y=-0.05),
+            height=1000,
+        )
+
+    return fig
+
+
+# 9. fare distribution plot function
+
+def generate_fare_distribution_plot(route: str):
+    """
+    generate the fare distribution plot (option 9: fare-distribution).
+    drawn from load-time summaries only, never from ticket rows: a box per quarter
+    from FARE_QUANTILES (box 25th-75th percentile, whiskers 10th / 90th, line at the
+    median, average fare from QUARTERLY_CUBE as a marker) and the whole-history
+    fare histogram from FARE_HISTOGRAMS, so the payload stays a few hundred numbers
+    however many tickets the route has.
+    """
+
+    if FARE_QUANTILES.empty:
+        return go.Figure().update_layout(title="no data loaded.")
+
+    origin, dest = route.split('-')
+
+    # 1. look up the route's summaries
+    with span('filter'):
+        quantiles = aggregates.route_rows(FARE_QUANTILES, origin, dest)
+        hist_cells = aggregates.route_rows(FARE_HISTOGRAMS, origin, dest)
+        cells = aggregates.route_rows(QUARTERLY_CUBE, origin, dest)
+
+    if quantiles.empty:
+        return go.Figure().update_layout(title=f"no data found for route: {route}")
+
+    # 2. whole-history histogram as a share of tickets per fare bin
+    with span('aggregate'):
+        hist = hist_cells.groupby(aggregates.BIN_COL)[aggregates.BIN_COUNT].sum()
+        share = hist / hist.sum()
+        bin_starts = hist.index.to_numpy() * aggregates.FARE_BIN_WIDTH
+        means = cells.set_index(PERIOD_COL)[FARE_MEAN].reindex(quantiles[PERIOD_COL])
+
+    # 3. quarterly boxes on top, histogram below
+    with span('figure'):
+        fig = make_subplots(
+            rows=2, cols=1, vertical_spacing=0.12,
+            subplot_titles=("quarterly fare distribution", "fare histogram (all quarters)"),
+        )
+        fig.add_trace(go.Box(
+            x=quantiles[PERIOD_COL],
+            q1=quantiles['p25'], median=quantiles['p50'], q3=quantiles['p75'],
+            lowerfence=quantiles['p10'], upperfence=quantiles['p90'],
+            name="10th / 25th / 50th / 75th / 90th percentile", marker_color='rgb(99,110,250)',
+        ), row=1, col=1)
+        fig.add_trace(go.Scatter(
+            x=quantiles[PERIOD_COL], y=means.to_numpy(), mode='markers',
+            marker=dict(symbol='diamond', size=6, color='rgb(239,85,59)'), name="average fare",
+        ), row=1, col=1)
+
+        last_bin = aggregates.FARE_BINS  # open-ended overflow bin
+        fig.add_trace(go.Bar(
+            x=bin_starts + aggregates.FARE_BIN_WIDTH / 2, y=share.to_numpy(),
+            width=aggregates.FARE_BIN_WIDTH, marker_color='rgb(99,110,250)', showlegend=False,
+            customdata=[f"${start:,.0f}+" if i == last_bin else f"${start:,.0f}-{start + aggregates.FARE_BIN_WIDTH:,.0f}"
+                        for i, start in zip(hist.index, bin_starts)],
+            hovertemplate="%{customdata}: %{y:.1%} of tickets<extra></extra>",
+        ), row=2, col=1)
+
+        fig.update_yaxes(tickprefix='$', row=1, col=1)
+        fig.update_xaxes(tickprefix='$', title_text="fare", row=2, col=1)
+        fig.update_yaxes(tickformat='.0%', title_text="share of tickets", row=2, col=1)
+        fig.update_layout(
+            title=f"fare distribution: {origin} → {dest}",
+            template="plotly_white",
+            legend=dict(orientation='h', y=-0.08),
+            height=800,
+        )
+
+    return fig
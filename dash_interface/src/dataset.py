@@ -0,0 +1,195 @@
+# src/dataset.py
+
+import os
+import re
+import json
+import hashlib
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+_REPO_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+
+# parquet_data/ holds one raw file per (Year, Quarter) partition
+PARQUET_DIR = os.environ.get('FLIGHT_PARQUET_DIR', os.path.join(_REPO_DIR, 'parquet_data'))
+PARTITION_PATTERN = re.compile(r'db1b_market_(\d{4})_(\d)\.parquet$')
+
+# output of the offline ETL (python -m src.etl): Year=<y>/Quarter=<q>/part-0.parquet
+CLEANED_DIR = os.environ.get('FLIGHT_CLEANED_DIR', os.path.join(_REPO_DIR, 'cleaned_flight_data'))
+CLEANED_PATTERN = re.compile(r'Year=(\d{4})/Quarter=(\d)/[^/]+\.parquet$')
+# written by the ETL after every partition; lists each raw source it has built
+MANIFEST_NAME = '_manifest.json'
+
+_INCOMPLETE_WARNED = set()
+
+
+# 1. partition discovery
+
+def default_data_dir() -> str:
+    """the ETL output when it covers every raw partition, the raw quarterly files otherwise"""
+    if not list_partitions(CLEANED_DIR):
+        return PARQUET_DIR
+
+    missing = missing_cleaned_sources(CLEANED_DIR, PARQUET_DIR)
+    if missing:
+        # a partial or outdated ETL run: serve the raw files until it completes
+        if CLEANED_DIR not in _INCOMPLETE_WARNED:
+            _INCOMPLETE_WARNED.add(CLEANED_DIR)
+            print(f"warning: {CLEANED_DIR} is missing {len(missing)} of the raw partitions "
+                  f"(e.g. {missing[0]}); loading {PARQUET_DIR} until the ETL completes.")
+        return PARQUET_DIR
+
+    _INCOMPLETE_WARNED.discard(CLEANED_DIR)
+    return CLEANED_DIR
+
+
+def missing_cleaned_sources(cleaned_dir: str, source_dir: str):
+    """
+    raw partition files in source_dir that the ETL manifest in cleaned_dir does not
+    list as built from their current size / mtime, or whose output is gone.
+    empty when the cleaned dataset is complete.
+    """
+    try:
+        with open(os.path.join(cleaned_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            sources = json.load(f).get('sources', {})
+    except (FileNotFoundError, ValueError):
+        sources = {}
+
+    missing = []
+    for _, _, path in list_partitions(source_dir):
+        if not PARTITION_PATTERN.search(path):
+            continue
+        entry = sources.get(os.path.basename(path), {})
+        stat = os.stat(path)
+        built = (entry.get('size'), entry.get('mtime_ns')) == (stat.st_size, stat.st_mtime_ns)
+        if not (built and entry.get('output') and os.path.exists(os.path.join(cleaned_dir, entry['output']))):
+            missing.append(os.path.basename(path))
+    return missing
+
+
+def list_partitions(data_dir: str = None):
+    """
+    list the (year, quarter, path) partitions in data_dir, sorted by time.
+    both the raw db1b_market_<year>_<q>.parquet naming and the ETL's
+    Year=<y>/Quarter=<q>/ layout are recognized; other files are ignored.
+    """
+    data_dir = data_dir or default_data_dir()
+
+    if not os.path.isdir(data_dir):
+        return []
+
+    partitions = []
+    for root, _, names in os.walk(data_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, data_dir).replace(os.sep, '/')
+            match = PARTITION_PATTERN.fullmatch(relative) or CLEANED_PATTERN.fullmatch(relative)
+            if match:
+                year, quarter = int(match.group(1)), int(match.group(2))
+                partitions.append((year, quarter, path))
+
+    return sorted(partitions)
+
+
+def prune_partitions(partitions, years=None, quarters=None):
+    """keep only the partitions matching the requested years / quarters"""
+    return [
+        (year, quarter, path) for year, quarter, path in partitions
+        if (years is None or year in years) and (quarters is None or quarter in quarters)
+    ]
+
+
+def fingerprint(partitions) -> str:
+    """
+    short version id of a set of partitions (file names, sizes and mtimes).
+    any added, removed or rewritten partition changes it, so it is used to key caches.
+    """
+    digest = hashlib.sha1()
+    for year, quarter, path in partitions:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+# 2. predicate construction
+
+def build_filter(origins=None, dests=None, pairs=None, airports=None, years=None, quarters=None):
+    """
+    build a pyarrow filter expression from the query arguments.
+    pairs is a list of (origin, dest) tuples and is OR-ed together, airports matches
+    rows with the airport as either origin or dest; all arguments are AND-ed together.
+    returns None when nothing needs filtering.
+    """
+    expr = None
+
+    def _and(left, right):
+        return right if left is None else left & right
+
+    if pairs:
+        pair_expr = None
+        for origin, dest in pairs:
+            cond = (ds.field('Origin') == origin) & (ds.field('Dest') == dest)
+            pair_expr = cond if pair_expr is None else pair_expr | cond
+        expr = _and(expr, pair_expr)
+
+    if airports is not None:
+        airports = list(airports)
+        expr = _and(expr, ds.field('Origin').isin(airports) | ds.field('Dest').isin(airports))
+    if origins is not None:
+        expr = _and(expr, ds.field('Origin').isin(list(origins)))
+    if dests is not None:
+        expr = _and(expr, ds.field('Dest').isin(list(dests)))
+    if years is not None:
+        expr = _and(expr, ds.field('Year').isin(list(years)))
+    if quarters is not None:
+        expr = _and(expr, ds.field('Quarter').isin(list(quarters)))
+
+    return expr
+
+
+# 3. scanning
+
+def open_dataset(years=None, quarters=None, data_dir: str = None):
+    """
+    open the partitions matching years / quarters as one pyarrow dataset over the
+    union of their columns (missing columns read as null).
+    returns None when no partition matches.
+    """
+    partitions = prune_partitions(list_partitions(data_dir), years, quarters)
+    if not partitions:
+        return None
+
+    # quarters were exported with different columns (e.g. OPERATING_CARRIER vs TkCarrier)
+    # and types; pyarrow would otherwise take the first file's schema and drop the rest
+    paths = [path for _, _, path in partitions]
+    schema = pa.unify_schemas([pq.read_schema(path) for path in paths], promote_options='permissive')
+    return ds.dataset(paths, format='parquet', schema=schema.remove_metadata())
+
+
+def scan(columns=None, origins=None, dests=None, pairs=None, airports=None, years=None,
+         quarters=None, data_dir: str = None):
+    """
+    read the requested columns for the matching rows into a pandas DataFrame.
+
+    partitions are pruned by file name (Year / Quarter) before anything is opened,
+    and the remaining predicate is pushed down to the parquet reader, which skips
+    row groups whose Origin / Dest / Year / Quarter statistics cannot match.
+    """
+    dataset = open_dataset(years, quarters, data_dir)
+    if dataset is None:
+        return None
+
+    if columns is not None:
+        columns = [col for col in columns if col in dataset.schema.names]
+
+    table = dataset.to_table(
+        columns=columns,
+        filter=build_filter(origins, dests, pairs, airports, years, quarters),
+    )
+    return table.to_pandas()
+
+
+def schema_names(data_dir: str = None):
+    """column names available in the partitioned dataset"""
+    dataset = open_dataset(data_dir=data_dir)
+    return [] if dataset is None else list(dataset.schema.names)
@@ -0,0 +1,178 @@
+# src/etl.py
+#
+# offline build step: turns the raw parquet_data/db1b_market_<year>_<q>.parquet files
+# into the cleaned, route-sorted dataset that load_data() prefers once it covers every source.
+#
+#   python -m src.etl [--source DIR] [--output DIR] [--workers N] [--force]
+
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from src import dataset
+from src.data_loader import clean_rows, TIME_COL, FARE_COL, ROUTE_COL, PASSENGER_COL
+
+MANIFEST_NAME = dataset.MANIFEST_NAME
+
+# lowercase duplicates of Origin / Dest and the stored pandas index are not carried over
+DROP_COLUMNS = {'origin', 'dest', '__index_level_0__'}
+
+DEFAULT_BATCH_SIZE = 65536
+DEFAULT_ROW_GROUP_SIZE = 16384
+
+
+# 1. one partition (runs in a worker process)
+
+def build_partition(source_path: str, year: int, quarter: int, output_dir: str,
+                    batch_size: int = DEFAULT_BATCH_SIZE,
+                    row_group_size: int = DEFAULT_ROW_GROUP_SIZE) -> dict:
+    """
+    stream one raw quarterly file through clean_rows() batch by batch and write
+    its cleaned partition sorted by (Origin, Dest, date).
+    each batch is converted back to Arrow right after cleaning, so peak memory is
+    one cleaned partition plus one pandas batch. small row groups over sorted rows
+    give tight Origin / Dest statistics for predicate pushdown.
+    """
+    source = pq.ParquetFile(source_path)
+    columns = [col for col in source.schema_arrow.names if col not in DROP_COLUMNS]
+
+    tables = []
+    for batch in source.iter_batches(batch_size=batch_size, columns=columns):
+        df = clean_rows(batch.to_pandas())
+        df[ROUTE_COL] = df['Origin'] + '-' + df['Dest']
+        tables.append(pa.Table.from_pandas(df, preserve_index=False))
+
+    if not tables:
+        return {'year': year, 'quarter': quarter, 'rows': 0}
+
+    table = pa.concat_tables(tables).sort_by(
+        [('Origin', 'ascending'), ('Dest', 'ascending'), (TIME_COL, 'ascending')]
+    )
+
+    partition_dir = os.path.join(output_dir, f"Year={year}", f"Quarter={quarter}")
+    os.makedirs(partition_dir, exist_ok=True)
+    output_path = os.path.join(partition_dir, 'part-0.parquet')
+    tmp_path = f"{output_path}.tmp{os.getpid()}"
+
+    pq.write_table(
+        table, tmp_path,
+        row_group_size=row_group_size,
+        compression='zstd',
+        write_statistics=True,
+    )
+    os.replace(tmp_path, output_path)
+
+    fares = table.column(FARE_COL)
+    return {
+        'year': year,
+        'quarter': quarter,
+        'output': os.path.relpath(output_path, output_dir),
+        'rows': table.num_rows,
+        'row_groups': pq.ParquetFile(output_path).num_row_groups,
+        'passengers': int(pc.sum(table.column(PASSENGER_COL)).as_py() or 0),
+        'fare_min': pc.min(fares).as_py(),
+        'fare_max': pc.max(fares).as_py(),
+    }
+
+
+# 2. incremental driver
+
+def _read_manifest(output_dir: str) -> dict:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'sources': {}}
+
+
+def _write_manifest(output_dir: str, manifest: dict):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _source_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _is_current(entry: dict, path: str, output_dir: str) -> bool:
+    """True when the source is unchanged since its partition was built and the output still exists"""
+    if not entry or {k: entry.get(k) for k in ('size', 'mtime_ns')} != _source_signature(path):
+        return False
+    return os.path.exists(os.path.join(output_dir, entry.get('output', '')))
+
+
+def run_etl(source_dir: str = None, output_dir: str = None, workers: int = None,
+            batch_size: int = DEFAULT_BATCH_SIZE, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+            force: bool = False) -> dict:
+    """
+    build (or update) the cleaned dataset.
+    only quarters whose source file is new or changed are processed, in parallel
+    across a process pool; partitions whose source disappeared are removed.
+    returns the updated manifest.
+    """
+    source_dir = source_dir or dataset.PARQUET_DIR
+    output_dir = output_dir or dataset.CLEANED_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    partitions = [
+        (year, quarter, path) for year, quarter, path in dataset.list_partitions(source_dir)
+        if dataset.PARTITION_PATTERN.search(path)
+    ]
+    manifest = _read_manifest(output_dir)
+    sources = manifest.setdefault('sources', {})
+
+    pending = [
+        (year, quarter, path) for year, quarter, path in partitions
+        if force or not _is_current(sources.get(os.path.basename(path)), path, output_dir)
+    ]
+    print(f"etl: {len(partitions)} source partitions, {len(pending)} to build, "
+          f"{len(partitions) - len(pending)} up to date.")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(build_partition, path, year, quarter, output_dir, batch_size, row_group_size): path
+                for year, quarter, path in pending
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                result = future.result()
+                sources[os.path.basename(path)] = {**_source_signature(path), **result}
+                print(f"etl: built {result['year']}Q{result['quarter']} ({result['rows']} rows).")
+                # checkpoint after each partition so an interrupted run resumes where it stopped
+                _write_manifest(output_dir, manifest)
+
+    # partitions whose raw file was removed
+    current = {os.path.basename(path) for _, _, path in partitions}
+    for name in [name for name in sources if name not in current]:
+        stale = os.path.join(output_dir, sources.pop(name).get('output', ''))
+        if os.path.isfile(stale):
+            os.remove(stale)
+        print(f"etl: removed partition for deleted source {name}.")
+
+    _write_manifest(output_dir, manifest)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="build the cleaned, partitioned flight dataset")
+    parser.add_argument('--source', default=dataset.PARQUET_DIR, help="raw db1b_market_<year>_<q>.parquet directory")
+    parser.add_argument('--output', default=dataset.CLEANED_DIR, help="cleaned dataset directory")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="rows per streamed batch")
+    parser.add_argument('--row-group-size', type=int, default=DEFAULT_ROW_GROUP_SIZE, help="rows per output row group")
+    parser.add_argument('--force', action='store_true', help="rebuild every partition")
+    args = parser.parse_args()
+
+    run_etl(args.source, args.output, args.workers, args.batch_size, args.row_group_size, args.force)
+
+
+if __name__ == "__main__":
+    main()
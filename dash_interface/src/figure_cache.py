@@ -0,0 +1,208 @@
+# src/figure_cache.py
+
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import plotly.io as pio
+from src.metrics import span
+
+
+# 1. optional shared backends (get / set of serialized figures)
+
+class FileBackend:
+    """
+    file-based key/value store with the get/set surface of a redis client.
+    lets several workers on one host share rendered figures without a server,
+    and can be swapped for RedisBackend without touching the callers.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', key)
+
+    def _path(self, key: str) -> str:
+        # readable key first so prune() can match prefixes; the hash keeps names unique
+        digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{self._name(key)[:80]}-{digest}.json")
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+
+    def prune(self, prefix: str, keep: str) -> int:
+        """delete the entries whose key starts with prefix but not with keep; returns the count"""
+        prefix, keep = self._name(prefix), self._name(keep)
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.endswith('.json') and name.startswith(prefix) and not name.startswith(keep):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except FileNotFoundError:
+                    pass  # pruned by another worker
+        return removed
+
+
+class RedisBackend:
+    """redis (or any redis-protocol server) backend; requires the optional `redis` package"""
+
+    def __init__(self, url: str, ttl_seconds: int = None):
+        import redis  # optional dependency, only needed when FIGURE_CACHE_REDIS_URL is set
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+
+    def exists(self, key: str) -> bool:
+        return bool(self.client.exists(key))
+
+    def get(self, key: str):
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes):
+        self.client.set(key, value, ex=self.ttl_seconds)
+
+    def prune(self, prefix: str, keep: str) -> int:
+        stale = [key for key in self.client.scan_iter(match=f"{prefix}*") if not key.startswith(keep.encode())]
+        return self.client.delete(*stale) if stale else 0
+
+
+# 2. in-process LRU
+
+class FigureCache:
+    """
+    bounded LRU cache of figures (as plotly JSON dicts) keyed by
+    (analysis type, route, data version), with hit / miss counters.
+    misses fall through to the optional backend before the figure is built.
+    """
+
+    def __init__(self, maxsize: int = 256, backend=None):
+        self.maxsize = maxsize
+        self.backend = backend
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    KEY_PREFIX = 'figure:'
+
+    @classmethod
+    def make_key(cls, analysis_type: str, route: str, version: str) -> str:
+        return f"{cls.KEY_PREFIX}{version}:{analysis_type}:{route}"
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        if self.backend is not None:
+            payload = self.backend.get(key)
+            if payload is not None:
+                figure = json.loads(payload)
+                with self._lock:
+                    self.backend_hits += 1
+                self._store(key, figure)
+                return figure
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, figure):
+        """store a plotly Figure (or an already serialized figure dict)"""
+        with span('serialize'):
+            payload = figure if isinstance(figure, str) else pio.to_json(figure, validate=False)
+            figure_dict = json.loads(payload)
+        self._store(key, figure_dict)
+        if self.backend is not None:
+            self.backend.set(key, payload.encode())
+        return figure_dict
+
+    def contains(self, key: str) -> bool:
+        """True when get(key) would hit, without touching the counters or the LRU order"""
+        with self._lock:
+            if key in self._items:
+                return True
+        return self.backend is not None and self.backend.exists(key)
+
+    def get_or_build(self, analysis_type: str, route: str, version: str, build):
+        """cached figure for the key, calling build() and storing its result on a miss"""
+        key = self.make_key(analysis_type, route, version)
+        with span('cache_lookup'):
+            figure = self.get(key)
+        if figure is None:
+            figure = self.set(key, build())
+        return figure
+
+    def _store(self, key: str, figure_dict):
+        with self._lock:
+            self._items[key] = figure_dict
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def prune_versions(self, version: str):
+        """drop the figures of every data version but `version`, in process and in the backend"""
+        keep = f"{self.KEY_PREFIX}{version}:"
+        with self._lock:
+            for key in [key for key in self._items if not key.startswith(keep)]:
+                del self._items[key]
+        removed = self.backend.prune(self.KEY_PREFIX, keep) if self.backend is not None else 0
+        if removed:
+            print(f"figure cache: removed {removed} stored figures of older data versions.")
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'backend_hits': self.backend_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'backend': type(self.backend).__name__ if self.backend is not None else None,
+            }
+
+
+def _create_default_cache() -> FigureCache:
+    """
+    FIGURE_CACHE_SIZE bounds the in-process LRU; FIGURE_CACHE_REDIS_URL or
+    FIGURE_CACHE_DIR add a shared backend (redis takes precedence).
+    """
+    maxsize = int(os.environ.get('FIGURE_CACHE_SIZE', '256'))
+    backend = None
+    if os.environ.get('FIGURE_CACHE_REDIS_URL'):
+        backend = RedisBackend(os.environ['FIGURE_CACHE_REDIS_URL'])
+    elif os.environ.get('FIGURE_CACHE_DIR'):
+        backend = FileBackend(os.environ['FIGURE_CACHE_DIR'])
+    return FigureCache(maxsize=maxsize, backend=backend)
+
+
+FIGURE_CACHE = _create_default_cache()
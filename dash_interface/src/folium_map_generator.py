@@ -1,12 +1,26 @@
 import folium 
 import pandas as pd 
 import os 
+import glob
+import json
+import tempfile
+import threading
 import numpy as np 
 import branca.colormap as cm 
-from dash import html
-from src.data_loader import DF_DATA, FARE_COL, ROUTE_COL, PASSENGER_COL 
+from dash import Dash, html
+from flask import abort, send_from_directory
+from src import data_loader
+from src.aggregates import FARE_SUM, FARE_COUNT, PASSENGER_SUM, AIRPORT_KEY
+from src.metrics import span
 
-map_html_path = os.path.join(os.getcwd(), 'assets', 'folium_map.html')
+# rendered maps are written here and served by /maps/<version>.html (see register_map_routes);
+# kept out of assets/ so a render never triggers the dev server's hot reload
+MAP_DIR = os.environ.get('FLIGHT_MAP_DIR', os.path.join(tempfile.gettempdir(), 'flight_dashboard', 'maps'))
+MAP_FILE_PREFIX = 'folium_map'
+
+# data version -> {'legend': ..., 'status': ...}; only the current version is kept
+_MAP_CACHE = {}
+_MAP_LOCK = threading.Lock()
 
 airport_coords = {
     "LAX": (33.9416, -118.4090), "LAS": (36.0800, -115.1522),
@@ -21,15 +35,65 @@ od_pairs = [
     ("LAX", "SFO"), ("JFK", "MCO"), ("SFO", "SEA"),
 ]
 
-def _add_kpi_layer(m, kpi_name, kpi_col, agg_func, is_fare):
-    """calculate kpi stats and add a featuregroup layer to the map"""
-    
-    route_stats = DF_DATA.groupby(['Origin', 'Dest'])[kpi_col].agg(agg_func).reset_index()
-    route_stats['Route'] = route_stats['Origin'] + '-' + route_stats['Dest']
-    route_stats.rename(columns={kpi_col: 'KPI_Value'}, inplace=True)
+def _compute_map_kpis():
+    """
+    route and airport kpis for the configured od_pairs / airport_coords in one pass.
+    the quarterly cube is filtered to cells touching the mapped airports, summed per
+    route with a single groupby, and the airport fares are one groupby over the
+    airport index (AIRPORT_CUBE).
+    returns (route_kpis indexed like od_pairs with 'fare' / 'volume' columns,
+    airport_fare Series indexed by airport code).
+    """
+    cube = data_loader.QUARTERLY_CUBE
+    airports = list(airport_coords)
+
+    origins = cube.index.get_level_values('Origin')
+    dests = cube.index.get_level_values('Dest')
+    cells = cube[origins.isin(airports) | dests.isin(airports)]
+
+    totals = cells.groupby(level=['Origin', 'Dest'], observed=True)[[FARE_SUM, FARE_COUNT, PASSENGER_SUM]].sum()
+    route_origins = totals.index.get_level_values('Origin').astype(str).to_numpy()
+    route_dests = totals.index.get_level_values('Dest').astype(str).to_numpy()
+    fare_sum = totals[FARE_SUM].to_numpy(dtype=float)
+    fare_count = totals[FARE_COUNT].to_numpy(dtype=float)
+    passenger_sum = totals[PASSENGER_SUM].to_numpy(dtype=float)
+
+    # 1. route kpis: mean fare and total passengers of each od pair
+    route_keys = pd.Series(np.arange(len(totals)), index=pd.Index(route_origins + '-' + route_dests))
+    positions = route_keys.reindex([f"{o}-{d}" for o, d in od_pairs]).to_numpy()
+    found = ~np.isnan(positions)
+    rows = positions[found].astype(int)
+
+    route_kpis = pd.DataFrame(
+        np.nan, index=pd.MultiIndex.from_tuples(od_pairs, names=['Origin', 'Dest']), columns=['fare', 'volume']
+    )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        route_kpis.loc[found, 'fare'] = fare_sum[rows] / fare_count[rows]
+    route_kpis.loc[found, 'volume'] = passenger_sum[rows]
+
+    # 2. airport fare: every row touching the airport counted once, read from the airport index
+    codes = np.array(airports)
+    airport_totals = data_loader.AIRPORT_CUBE.groupby(level=AIRPORT_KEY)[[FARE_SUM, FARE_COUNT]].sum().reindex(codes)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        airport_fare = airport_totals[FARE_SUM] / airport_totals[FARE_COUNT]
+
+    return route_kpis, airport_fare
+
+
+def map_kpis():
+    """
+    the market map's kpis as tables (used by the export api):
+    routes (Origin, Dest, fare, volume) in od_pairs order and airports (Airport, fare).
+    """
+    route_kpis, airport_fare = _compute_map_kpis()
+    airports = pd.DataFrame({'Airport': airport_fare.index.astype(str), 'fare': airport_fare.to_numpy()})
+    return route_kpis.reset_index(), airports
+
+
+def _add_kpi_layer(m, route_kpis, kpi_name, kpi_col, is_fare):
+    """add a featuregroup layer for one precomputed kpi column to the map"""
     
-    required_routes = [f"{o}-{d}" for o, d in od_pairs]
-    kpi_values = route_stats[route_stats['Route'].isin(required_routes)]['KPI_Value'].dropna()
+    kpi_values = route_kpis[kpi_col].dropna()
     
     if kpi_values.empty:
         status_msg = f"invalid data: {kpi_name} layer has no valid kpi values"
@@ -57,34 +121,26 @@ def _add_kpi_layer(m, kpi_name, kpi_col, agg_func, is_fare):
     range_diff = max_val - min_val
     if range_diff == 0: range_diff = 1 
             
+    # line weights for all routes at once, then one PolyLine per route
+    line_weights = min_weight + (kpi_values.to_numpy() - min_val) / range_diff * (max_weight - min_weight)
+
     num_routes_drawn = 0
-    for origin, dest in od_pairs:
+    for ((origin, dest), kpi_value), line_weight in zip(kpi_values.items(), line_weights):
         route_str = f"{origin}-{dest}"
-        route_data = route_stats.query("Origin == @origin and Dest == @dest")
+        line_color = colormap(kpi_value)
         
-        if not route_data.empty:
-            kpi_value = route_data['KPI_Value'].iloc[0]
-            
-            if pd.isna(kpi_value): 
-                continue 
-                 
-            line_color = colormap(kpi_value)
-            
-            normalized_kpi = (kpi_value - min_val) / range_diff
-            line_weight = min_weight + normalized_kpi * (max_weight - min_weight)
-            
-            tooltip_val = f"{kpi_value:.2f}" if is_fare else f"{kpi_value:,.0f}"
-            tooltip_text = f"Route: {route_str}<br>{caption}: {unit}{tooltip_val}"
-            
-            folium.PolyLine(
-                [airport_coords[origin], airport_coords[dest]],
-                color=line_color,
-                weight=line_weight,
-                opacity=0.8,
-                tooltip=tooltip_text
-            ).add_to(fg)
-            
-            num_routes_drawn += 1
+        tooltip_val = f"{kpi_value:.2f}" if is_fare else f"{kpi_value:,.0f}"
+        tooltip_text = f"Route: {route_str}<br>{caption}: {unit}{tooltip_val}"
+        
+        folium.PolyLine(
+            [airport_coords[origin], airport_coords[dest]],
+            color=line_color,
+            weight=line_weight,
+            opacity=0.8,
+            tooltip=tooltip_text
+        ).add_to(fg)
+        
+        num_routes_drawn += 1
             
     fg.add_to(m)
     status_msg = f"successfully generated {num_routes_drawn} routes"
@@ -93,25 +149,35 @@ def _add_kpi_layer(m, kpi_name, kpi_col, agg_func, is_fare):
 def create_folium_map():
     
     m = folium.Map(location=[39.8283, -98.5795], zoom_start=4, tiles="CartoDB positron")
-    folium.TileLayer('Stamen Toner Lite', name='base map (simple)').add_to(m)
+    # stamen tiles now need an api key (folium 0.14 has no attribution for them); carto's
+    # label-free light tiles are the keyless equivalent
+    folium.TileLayer(
+        'https://{s}.basemaps.cartocdn.com/light_nolabels/{z}/{x}/{y}{r}.png',
+        attr='&copy; OpenStreetMap contributors &copy; CARTO',
+        name='base map (simple)',
+    ).add_to(m)
     
-    if DF_DATA.empty:
+    if data_loader.QUARTERLY_CUBE.empty:
         return html.Div("data empty, cannot generate map"), None, None, {
-            "fare": "DF_DATA empty",
-            "volume": "DF_DATA empty"
+            "fare": "no data loaded",
+            "volume": "no data loaded"
         }
 
-    fare_fg, fare_colormap, fare_status = _add_kpi_layer(
-        m, "avg fare routes", FARE_COL, 'mean', True
-    )
-    volume_fg, volume_colormap, volume_status = _add_kpi_layer(
-        m, "total passenger volume routes", PASSENGER_COL, 'sum', False
-    )
+    # all route and airport kpis in one pass over the aggregates
+    with span('map_kpis'):
+        route_kpis, airport_fares = _compute_map_kpis()
+
+    with span('map_layers'):
+        fare_fg, fare_colormap, fare_status = _add_kpi_layer(
+            m, route_kpis, "avg fare routes", 'fare', True
+        )
+        volume_fg, volume_colormap, volume_status = _add_kpi_layer(
+            m, route_kpis, "total passenger volume routes", 'volume', False
+        )
 
     airport_fg = folium.FeatureGroup(name='airport markers', show=True)
     for code, (lat, lon) in airport_coords.items():
-        airport_data = DF_DATA.query("Origin == @code or Dest == @code")
-        airport_fare = airport_data[FARE_COL].mean()
+        airport_fare = airport_fares[code]
         
         popup_text = (
             f"{code}<br>Avg Fare: ${airport_fare:.2f}"
@@ -149,14 +215,109 @@ def create_folium_map():
         """
     m.get_root().script.add_child(folium.Element(js_fix))
 
-    map_html = m.get_root().render()
+    with span('map_render'):
+        map_html = m.get_root().render()
+
+    status = {"fare": fare_status, "volume": volume_status}
+
+    return map_html, fare_colormap, volume_colormap, status
+
+
+# cached market map
+
+def _map_file(version: str, ext: str) -> str:
+    return os.path.join(MAP_DIR, f"{MAP_FILE_PREFIX}_{version}.{ext}")
+
+
+def _write_atomic(path: str, text: str):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _load_map_entry(version: str):
+    """map entry rendered earlier (possibly by another worker) for this version, if on disk"""
+    if not (os.path.exists(_map_file(version, 'html')) and os.path.exists(_map_file(version, 'json'))):
+        return None
+    with open(_map_file(version, 'json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _build_map_entry(version: str):
+    """render the map, write it to MAP_DIR and drop files of older versions"""
+    map_html, fare_colormap, volume_colormap, status = create_folium_map()
+    if not isinstance(map_html, str):
+        return None
+
+    entry = {
+        'legend': {
+            'fare': [float(fare_colormap.vmin), float(fare_colormap.vmax)] if fare_colormap else None,
+            'volume': [float(volume_colormap.vmin), float(volume_colormap.vmax)] if volume_colormap else None,
+        },
+        'status': status,
+    }
+
+    os.makedirs(MAP_DIR, exist_ok=True)
+    with span('map_write'):
+        _write_atomic(_map_file(version, 'html'), map_html)
+        _write_atomic(_map_file(version, 'json'), json.dumps(entry))
+
+    # only finished files of other versions; *.tmp<pid> files may be another worker's write in flight
+    for ext in ('html', 'json'):
+        for path in glob.glob(os.path.join(MAP_DIR, f"{MAP_FILE_PREFIX}_*.{ext}")):
+            if path != _map_file(version, ext):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass  # removed by another worker
+
+    return entry
+
+
+def map_ready() -> bool:
+    """True when the map of the loaded data version is already rendered (in memory or on disk)"""
+    version = data_loader.DATA_VERSION
+    return version in _MAP_CACHE or _load_map_entry(version) is not None
+
+
+def get_market_map():
+    """
+    market map for the loaded data version: (iframe, legend ranges, status).
+    the map is rendered at most once per data version, cached in memory and on
+    disk, and the iframe loads it from /maps/<version>.html instead of a srcDoc payload.
+    legend ranges are {'fare': [vmin, vmax] or None, 'volume': ...}.
+    """
+    version = data_loader.DATA_VERSION
+    entry = _MAP_CACHE.get(version)
+
+    if entry is None:
+        with _MAP_LOCK:
+            entry = _MAP_CACHE.get(version) or _load_map_entry(version) or _build_map_entry(version)
+            if entry is None:
+                return html.Div("data empty, cannot generate map"), {'fare': None, 'volume': None}, {
+                    "fare": "no data loaded",
+                    "volume": "no data loaded"
+                }
+            _MAP_CACHE.clear()
+            _MAP_CACHE[version] = entry
 
     map_component = html.Iframe(
         id="folium-map-iframe",
-        srcDoc=map_html,
+        src=f"/maps/{version}.html",
         style={"width": "100%", "height": "600px", "border": "none"}
     )
 
-    status = {"fare": fare_status, "volume": volume_status}
+    return map_component, entry['legend'], entry['status']
+
+
+def register_map_routes(app: Dash):
+    """/maps/<version>.html serves the rendered market map of a data version"""
+    server = app.server
 
-    return map_component, fare_colormap, volume_colormap, status
+    @server.route('/maps/<version>.html')
+    def market_map_page(version):
+        if not os.path.exists(_map_file(version, 'html')):
+            abort(404)
+        # one file per data version, so the browser may keep it until the version changes
+        return send_from_directory(MAP_DIR, os.path.basename(_map_file(version, 'html')), max_age=86400)
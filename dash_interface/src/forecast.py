@@ -0,0 +1,225 @@
+# src/forecast.py
+
+import os
+import json
+import time
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.aggregates import FARE_SUM, FARE_COUNT
+
+# trained models are persisted per data version and reused by every worker
+FORECAST_DIR = os.environ.get(
+    'FORECAST_DIR',
+    os.path.join(tempfile.gettempdir(), 'flight_dashboard', 'forecasts'),
+)
+HORIZON = int(os.environ.get('FORECAST_HORIZON', '4'))  # quarters ahead
+BACKTEST_QUARTERS = 4
+MIN_HISTORY = 8  # fewer quarters than this fall back to the seasonal baseline
+PARALLEL_MIN_ROUTES = 200  # below this, training in-process is faster than a pool
+MODEL_FORMAT = 2  # bump when the stored model layout changes; older files are retrained
+
+# route -> trained model for MODELS_VERSION
+MODELS = {}
+MODELS_VERSION = None
+
+
+# 1. per-route model: linear trend + quarter-of-year offsets or seasonal-naive, picked by backtest
+
+def _design(t: np.ndarray, quarters: np.ndarray) -> np.ndarray:
+    return np.column_stack([np.ones(len(t)), t, quarters == 2, quarters == 3, quarters == 4]).astype(float)
+
+
+def _fit(t, quarters, fares):
+    coef, *_ = np.linalg.lstsq(_design(t, quarters), fares, rcond=None)
+    resid = fares - _design(t, quarters) @ coef
+    return coef, float(resid.std(ddof=1)) if len(resid) > 1 else 0.0
+
+
+def _seasonal_naive(t, fares, target_t):
+    """value observed four quarters earlier (or the latest value when there is none)"""
+    lookup = dict(zip(t.tolist(), fares.tolist()))
+    return np.array([lookup.get(step - 4, fares[-1]) for step in target_t])
+
+
+def _seasonal_spread(t, fares) -> float:
+    """in-sample error of the seasonal-naive forecast (the fare spread when it is too short)"""
+    lookup = dict(zip(t.tolist(), fares.tolist()))
+    errors = [fare - lookup[step - 4] for step, fare in zip(t.tolist(), fares.tolist()) if step - 4 in lookup]
+    if len(errors) > 1:
+        return float(np.std(errors, ddof=1))
+    return float(np.std(fares, ddof=1)) if len(fares) > 1 else 0.0
+
+
+def _backtest(t, quarters, fares):
+    """fit on all but the last BACKTEST_QUARTERS quarters and score both models on them"""
+    train, test = slice(None, -BACKTEST_QUARTERS), slice(-BACKTEST_QUARTERS, None)
+    coef, _ = _fit(t[train], quarters[train], fares[train])
+    actual = fares[test]
+    predictions = {
+        'trend+season': _design(t[test], quarters[test]) @ coef,
+        'seasonal-naive': _seasonal_naive(t[train], fares[train], t[test]),
+    }
+    scores = {}
+    for model, predicted in predictions.items():
+        scores[model] = {
+            'mae': float(np.mean(np.abs(predicted - actual))),
+            'mape': float(np.nanmean(np.abs(predicted - actual) / np.where(actual == 0, np.nan, actual))),
+        }
+    return scores
+
+
+def train_route(t: np.ndarray, fares: np.ndarray) -> dict:
+    """
+    fit one route on its quarterly mean fares.
+    t is the quarter index (year * 4 + quarter - 1). returns a json-serializable model
+    with the next HORIZON quarters of forecast and a 95% band. with enough history
+    both models are backtested on the last BACKTEST_QUARTERS quarters and the one
+    with the lower MAE is served; shorter series use the seasonal-naive baseline.
+    """
+    quarters = t % 4 + 1
+    future_t = np.arange(t[-1] + 1, t[-1] + 1 + HORIZON)
+    future_q = future_t % 4 + 1
+
+    model, backtest = 'seasonal-naive', None
+    if len(t) >= MIN_HISTORY + BACKTEST_QUARTERS:
+        scores = _backtest(t, quarters, fares)
+        if scores['trend+season']['mae'] < scores['seasonal-naive']['mae']:
+            model = 'trend+season'
+        backtest = {
+            'quarters': BACKTEST_QUARTERS,
+            'mae': scores[model]['mae'],
+            'mape': scores[model]['mape'],
+            'trend_mae': scores['trend+season']['mae'],
+            'baseline_mae': scores['seasonal-naive']['mae'],
+        }
+    elif len(t) >= MIN_HISTORY:
+        model = 'trend+season'
+
+    if model == 'trend+season':
+        coef, spread = _fit(t, quarters, fares)
+        prediction = _design(future_t, future_q) @ coef
+    else:
+        prediction = _seasonal_naive(t, fares, future_t)
+        spread = _seasonal_spread(t, fares)
+
+    return {
+        'model': model,
+        'history_quarters': int(len(t)),
+        't': future_t.tolist(),
+        'fare': np.round(prediction, 2).tolist(),
+        'lower': np.round(prediction - 1.96 * spread, 2).tolist(),
+        'upper': np.round(prediction + 1.96 * spread, 2).tolist(),
+        'backtest': backtest,
+    }
+
+
+def _train_chunk(items):
+    return [(route, train_route(np.asarray(t), np.asarray(fares))) for route, t, fares in items]
+
+
+# 2. batch training over the quarterly cube
+
+def route_series(cube: pd.DataFrame):
+    """(route, quarter index, mean fare) for every route in the quarterly cube"""
+    cells = cube[cube[FARE_COUNT] > 0].reset_index()
+    cells['t'] = cells['Year'].astype(int) * 4 + cells['Quarter'].astype(int) - 1
+    cells['fare'] = cells[FARE_SUM] / cells[FARE_COUNT]
+    cells = cells.sort_values(['Origin', 'Dest', 't'])
+
+    for (origin, dest), group in cells.groupby(['Origin', 'Dest'], observed=True, sort=False):
+        yield f"{origin}-{dest}", group['t'].to_numpy(), group['fare'].to_numpy()
+
+
+def train_all(cube: pd.DataFrame, workers: int = None) -> dict:
+    """
+    train every route. large route counts are split into chunks and fitted on a
+    process pool (spawned workers, safe to start from the loader thread).
+    """
+    items = [(route, t.tolist(), fares.tolist()) for route, t, fares in route_series(cube)]
+
+    if len(items) < PARALLEL_MIN_ROUTES:
+        return dict(_train_chunk(items))
+
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, len(items) // (workers * 4))
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    models = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for result in pool.map(_train_chunk, chunks):
+            models.update(result)
+    return models
+
+
+def backtest_summary(models: dict) -> dict:
+    """
+    mean backtest metrics over the routes that have enough history. mae / mape are
+    those of the served models; trend_mae and baseline_mae score each model alone.
+    """
+    scored = [model for model in models.values() if model['backtest']]
+    if not scored:
+        return {'routes': 0}
+    chosen = pd.Series([model['model'] for model in scored]).value_counts()
+    return {
+        'routes': len(scored),
+        'mae': float(np.mean([m['backtest']['mae'] for m in scored])),
+        'mape': float(np.nanmean([m['backtest']['mape'] for m in scored])),
+        'trend_mae': float(np.mean([m['backtest']['trend_mae'] for m in scored])),
+        'baseline_mae': float(np.mean([m['backtest']['baseline_mae'] for m in scored])),
+        'models': {name: int(count) for name, count in chosen.items()},
+    }
+
+
+# 3. persistence and the in-memory model cache
+
+def _model_path(version: str) -> str:
+    return os.path.join(FORECAST_DIR, f"forecasts_{version}.json")
+
+
+def load_or_train(version: str, cube: pd.DataFrame, workers: int = None):
+    """
+    make MODELS current for version: read the persisted models when another
+    worker (or an earlier run) already trained them, otherwise train and persist.
+    """
+    global MODELS, MODELS_VERSION
+
+    if MODELS_VERSION == version:
+        return
+
+    path = _model_path(version)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            stored = json.load(f)
+        if stored.get('format') == MODEL_FORMAT:
+            MODELS, MODELS_VERSION = stored['routes'], version
+            print(f"forecast models loaded for {len(MODELS)} routes from {path}.")
+            return
+
+    start = time.perf_counter()
+    models = train_all(cube, workers)
+    summary = backtest_summary(models)
+    print(f"forecast models trained for {len(models)} routes in {time.perf_counter() - start:.2f}s "
+          f"(backtest: {summary}).")
+
+    os.makedirs(FORECAST_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'format': MODEL_FORMAT, 'version': version, 'horizon': HORIZON,
+                   'backtest': summary, 'routes': models}, f)
+    os.replace(tmp_path, path)
+
+    MODELS, MODELS_VERSION = models, version
+
+
+def get_forecast(route: str):
+    """trained model for a route, or None (no fitting happens here)"""
+    return MODELS.get(route)
+
+
+def quarter_start(t) -> pd.DatetimeIndex:
+    """first day of the quarter for quarter indexes t (year * 4 + quarter - 1)"""
+    t = np.asarray(t)
+    return pd.to_datetime(pd.DataFrame({'year': t // 4, 'month': (t % 4) * 3 + 1, 'day': 1}))
@@ -0,0 +1,51 @@
+# src/health.py
+
+from dash import Dash
+from flask import Response, jsonify
+from src import data_loader, metrics, warmup
+from src.figure_cache import FIGURE_CACHE
+
+
+def register_health_routes(app: Dash):
+    """
+    liveness / readiness routes on the underlying flask server.
+    /healthz answers as soon as the process serves requests;
+    /readyz returns 503 until the background data load is done;
+    /cache-stats reports figure cache hits / misses and the last warm-up run;
+    /metrics exposes the latency histograms (src/metrics.py) plus cache and
+    data gauges in the prometheus text format.
+    """
+    server = app.server
+
+    @server.route('/healthz')
+    def healthz():
+        return jsonify(status='ok')
+
+    @server.route('/readyz')
+    def readyz():
+        status = data_loader.load_status()
+        return jsonify(status), (200 if status['state'] == 'ready' else 503)
+
+    @server.route('/cache-stats')
+    def cache_stats():
+        return jsonify(figure_cache=FIGURE_CACHE.stats(), warmup=warmup.warmup_status())
+
+    @server.route('/metrics')
+    def prometheus_metrics():
+        prefix = metrics.METRIC_PREFIX
+        cache = FIGURE_CACHE.stats()
+        lines = metrics.render_metrics()
+        for name in ('hits', 'backend_hits', 'misses', 'evictions'):
+            lines += [
+                f"# TYPE {prefix}_figure_cache_{name}_total counter",
+                f"{prefix}_figure_cache_{name}_total {cache[name]}",
+            ]
+        lines += [
+            f"# TYPE {prefix}_figure_cache_size gauge",
+            f"{prefix}_figure_cache_size {cache['size']}",
+            f"# TYPE {prefix}_data_ready gauge",
+            f"{prefix}_data_ready {int(data_loader.is_ready())}",
+            f"# TYPE {prefix}_data_generation gauge",
+            f"{prefix}_data_generation {data_loader.DATA_GENERATION}",
+        ]
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
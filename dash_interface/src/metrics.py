@@ -0,0 +1,203 @@
+# src/metrics.py
+
+import os
+import re
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from dash import Dash
+from flask import g, request
+
+METRIC_PREFIX = 'flight_dashboard'
+
+# histogram upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# routes beyond this many distinct values are reported as route="other",
+# so a large route catalog cannot blow up the number of series
+MAX_ROUTE_LABELS = int(os.environ.get('METRICS_MAX_ROUTES', '200'))
+
+# opt-in request profiling: FLIGHT_PROFILE=1 enables it for requests that ask for it
+# (header "X-Profile: 1", ?profile=1 or a "profile=1" cookie);
+# FLIGHT_PROFILE_SLOW_MS additionally profiles every request and keeps the slow ones
+PROFILE_ENABLED = os.environ.get('FLIGHT_PROFILE', '0') == '1'
+PROFILE_SLOW_MS = float(os.environ.get('FLIGHT_PROFILE_SLOW_MS', '0'))
+PROFILE_DIR = os.environ.get('FLIGHT_PROFILE_DIR', os.path.join(os.getcwd(), 'profiles'))
+
+# labels of the request being served (analysis type / route), picked up by every span
+_REQUEST_LABELS = contextvars.ContextVar('request_labels', default={})
+
+
+# 1. histograms
+
+class Histogram:
+    """cumulative-bucket histogram per label set, rendered in the prometheus text format"""
+
+    def __init__(self, name: str, help_text: str, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # sorted label items -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            labels = ','.join(f'{k}="{_escape(v)}"' for k, v in key)
+            sep = ',' if labels else ''
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram(
+    f"{METRIC_PREFIX}_callback_seconds", "update_content latency by analysis type and route"
+)
+STAGE_SECONDS = Histogram(
+    f"{METRIC_PREFIX}_stage_seconds", "time spent per stage (filter, aggregate, figure, serialize, map render, ...)"
+)
+
+_ROUTE_LABELS = set()
+_ROUTE_LOCK = threading.Lock()
+
+
+def _route_label(route) -> str:
+    if not route:
+        return 'none'
+    with _ROUTE_LOCK:
+        if route in _ROUTE_LABELS:
+            return route
+        if len(_ROUTE_LABELS) < MAX_ROUTE_LABELS:
+            _ROUTE_LABELS.add(route)
+            return route
+    return 'other'
+
+
+# 2. spans
+
+@contextmanager
+def request_labels(analysis_type: str, route: str = None):
+    """
+    label every span inside the block with the analysis type / route and
+    observe the whole block as one callback.
+    """
+    labels = {'analysis_type': analysis_type or 'none', 'route': _route_label(route)}
+    token = _REQUEST_LABELS.set(labels)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, **labels)
+        _REQUEST_LABELS.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """time one stage; labelled with the current request's analysis type / route"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, **_REQUEST_LABELS.get())
+
+
+# 3. prometheus text format (served by /metrics in src/health.py)
+
+def render_metrics() -> list:
+    return REQUEST_SECONDS.render() + STAGE_SECONDS.render()
+
+
+# 4. opt-in request profiling
+
+def _profile_requested() -> bool:
+    return (
+        request.headers.get('X-Profile') == '1'
+        or request.args.get('profile') == '1'
+        or request.cookies.get('profile') == '1'
+    )
+
+
+def _start_profiler():
+    """pyinstrument when installed (optional dependency), cProfile otherwise"""
+    try:
+        from pyinstrument import Profiler
+        profiler = Profiler()
+    except ImportError:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    profiler.start()
+    return profiler
+
+
+def _dump_profile(profiler, elapsed_ms: float) -> str:
+    """write the profile under PROFILE_DIR, named after the request and its duration"""
+    target = request.path
+    if request.path == '/_dash-update-component':
+        body = request.get_json(silent=True) or {}
+        target = body.get('output', target)
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', target).strip('-')[:60] or 'root'
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{elapsed_ms:.0f}ms_{slug}")
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if hasattr(profiler, 'output_html'):
+        profiler.stop()
+        path += '.html'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+    else:
+        profiler.disable()
+        path += '.prof'
+        profiler.dump_stats(path)
+    return path
+
+
+def register_profiling(app: Dash):
+    """per-request profiler hooks on the flask server (no-op unless FLIGHT_PROFILE=1)"""
+    server = app.server
+
+    if not PROFILE_ENABLED:
+        return
+
+    @server.before_request
+    def start_profiling():
+        if PROFILE_SLOW_MS > 0 or _profile_requested():
+            g.profiler = _start_profiler()
+            g.profile_start = time.perf_counter()
+
+    @server.after_request
+    def stop_profiling(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        elapsed_ms = (time.perf_counter() - g.pop('profile_start')) * 1000
+        if _profile_requested() or elapsed_ms >= PROFILE_SLOW_MS:
+            response.headers['X-Profile-Path'] = _dump_profile(profiler, elapsed_ms)
+        elif hasattr(profiler, 'output_html'):
+            profiler.stop()
+        else:
+            profiler.disable()
+        return response
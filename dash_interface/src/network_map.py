@@ -0,0 +1,204 @@
+# src/network_map.py
+
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+from dash import Dash
+from flask import Response, request
+from src import data_loader
+from src.aggregates import FARE_SUM, FARE_COUNT, PASSENGER_SUM
+
+# bundled coordinate table for the national network (code, name, lat, lon)
+AIRPORTS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'airports.csv')
+
+DEFAULT_TOP_N = int(os.environ.get('NETWORK_MAP_TOP_N', '2000'))
+MAX_TOP_N = 50000
+
+_AIRPORTS = None
+_TOTALS_CACHE = {}  # data version -> route totals with coordinates
+_PAYLOAD_CACHE = {}  # (data version, top_n, min_passengers) -> json text
+_LOCK = threading.Lock()
+
+
+# 1. server-side aggregation
+
+def load_airport_table() -> pd.DataFrame:
+    """airport coordinates indexed by code"""
+    global _AIRPORTS
+    if _AIRPORTS is None:
+        _AIRPORTS = pd.read_csv(AIRPORTS_CSV).set_index('code')
+    return _AIRPORTS
+
+
+def _route_totals(version: str) -> pd.DataFrame:
+    """
+    whole-history totals of every route with both endpoints in the airport table,
+    sorted by passengers (built once per data version from the quarterly cube).
+    """
+    totals = _TOTALS_CACHE.get(version)
+    if totals is not None:
+        return totals
+
+    cube = data_loader.QUARTERLY_CUBE
+    totals = cube.groupby(level=['Origin', 'Dest'], observed=True)[[FARE_SUM, FARE_COUNT, PASSENGER_SUM]].sum()
+    totals = totals.reset_index()
+    totals['Origin'] = totals['Origin'].astype(str)
+    totals['Dest'] = totals['Dest'].astype(str)
+
+    airports = load_airport_table()
+    known = totals['Origin'].isin(airports.index) & totals['Dest'].isin(airports.index)
+    unknown = int((~known).sum())
+    if unknown:
+        print(f"network map: {unknown} routes skipped (airport missing from {os.path.basename(AIRPORTS_CSV)}).")
+
+    totals = totals[known & (totals[FARE_COUNT] > 0)].copy()
+    totals['fare'] = totals[FARE_SUM] / totals[FARE_COUNT]
+    totals = totals.sort_values(PASSENGER_SUM, ascending=False, ignore_index=True)
+
+    _TOTALS_CACHE.clear()
+    _TOTALS_CACHE[version] = totals
+    return totals
+
+
+def network_payload(top_n: int = DEFAULT_TOP_N, min_passengers: int = 0) -> str:
+    """
+    compact columnar JSON of the busiest routes: airports are listed once and
+    routes reference them by position, so each route costs four numbers
+    (origin, dest, mean fare, passengers) instead of a GeoJSON feature.
+    """
+    version = data_loader.DATA_VERSION
+    key = (version, top_n, min_passengers)
+
+    with _LOCK:
+        if key in _PAYLOAD_CACHE:
+            return _PAYLOAD_CACHE[key]
+
+        totals = _route_totals(version)
+        shown = totals[totals[PASSENGER_SUM] >= min_passengers].head(top_n)
+
+        codes = pd.Index(pd.unique(np.concatenate([shown['Origin'].to_numpy(), shown['Dest'].to_numpy()])))
+        coords = load_airport_table().loc[codes]
+
+        payload = json.dumps({
+            'version': version,
+            'total_routes': int(len(totals)),
+            'airports': {
+                'code': codes.tolist(),
+                'lat': coords['lat'].round(4).tolist(),
+                'lon': coords['lon'].round(4).tolist(),
+            },
+            'routes': {
+                'origin': codes.get_indexer(shown['Origin']).tolist(),
+                'dest': codes.get_indexer(shown['Dest']).tolist(),
+                'fare': shown['fare'].round(2).tolist(),
+                'passengers': shown[PASSENGER_SUM].astype(int).tolist(),
+            },
+        }, separators=(',', ':'))
+
+        if len(_PAYLOAD_CACHE) > 64 or any(cached[0] != version for cached in _PAYLOAD_CACHE):
+            _PAYLOAD_CACHE.clear()
+        _PAYLOAD_CACHE[key] = payload
+        return payload
+
+
+# 2. client-side renderer (leaflet canvas, one fetch of the payload above)
+
+NETWORK_MAP_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>
+  html, body, #map { height: 100%; margin: 0; }
+  #controls { position: absolute; top: 10px; left: 50px; z-index: 1000; background: white;
+              padding: 6px 10px; border-radius: 4px; font: 13px sans-serif; box-shadow: 0 1px 4px #999; }
+</style>
+</head>
+<body>
+<div id="controls">
+  top routes <select id="top-n">
+    <option>100</option><option>500</option><option>2000</option><option>10000</option><option>50000</option>
+  </select>
+  color <select id="metric"><option value="fare">avg fare</option><option value="passengers">passengers</option></select>
+  <span id="summary"></span>
+</div>
+<div id="map"></div>
+<script>
+  const map = L.map('map', {preferCanvas: true}).setView([39.8283, -98.5795], 4);
+  L.tileLayer('https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png', {
+    attribution: '&copy; OpenStreetMap contributors &copy; CARTO'
+  }).addTo(map);
+  const renderer = L.canvas({padding: 0.5});
+  let layer = L.layerGroup().addTo(map);
+  let data = null;
+
+  function color(t) {  // 0 -> green, 1 -> red
+    const r = Math.round(255 * Math.min(1, 2 * t)), g = Math.round(255 * Math.min(1, 2 * (1 - t)));
+    return `rgb(${r},${g},60)`;
+  }
+
+  function draw() {
+    const metric = document.getElementById('metric').value;
+    const a = data.airports, r = data.routes, values = r[metric];
+    const lo = Math.min(...values), hi = Math.max(...values), span = (hi - lo) || 1;
+    const maxPax = Math.max(...r.passengers) || 1;
+    layer.clearLayers();
+    for (let i = 0; i < r.origin.length; i++) {
+      const o = r.origin[i], d = r.dest[i];
+      let t = (values[i] - lo) / span;
+      if (metric === 'passengers') t = 1 - t;
+      L.polyline([[a.lat[o], a.lon[o]], [a.lat[d], a.lon[d]]], {
+        renderer, color: color(t), opacity: 0.6, weight: 1 + 5 * r.passengers[i] / maxPax
+      }).bindTooltip(`${a.code[o]}-${a.code[d]}<br>avg fare: $${r.fare[i].toFixed(2)}` +
+                     `<br>passengers: ${r.passengers[i].toLocaleString()}`).addTo(layer);
+    }
+    for (let j = 0; j < a.code.length; j++) {
+      L.circleMarker([a.lat[j], a.lon[j]], {renderer, radius: 3, color: 'blue', fillOpacity: 0.9})
+        .bindTooltip(a.code[j]).addTo(layer);
+    }
+    document.getElementById('summary').textContent =
+      ` ${r.origin.length.toLocaleString()} of ${data.total_routes.toLocaleString()} routes`;
+  }
+
+  async function load() {
+    const topN = document.getElementById('top-n').value;
+    const minPassengers = params.get('min_passengers') || 0, version = params.get('v') || '';
+    const response = await fetch(`routes.json?top_n=${topN}&min_passengers=${minPassengers}&v=${version}`);
+    data = await response.json();
+    draw();
+  }
+
+  const params = new URLSearchParams(window.location.search);
+  document.getElementById('top-n').value = params.get('top_n') || '__TOP_N__';
+  document.getElementById('top-n').onchange = load;
+  document.getElementById('metric').onchange = draw;
+  load();
+</script>
+</body>
+</html>
+"""
+
+
+def register_network_routes(app: Dash):
+    """/network/map (static renderer page) and /network/routes.json (route payload)"""
+    server = app.server
+
+    @server.route('/network/map')
+    def network_map_page():
+        return Response(NETWORK_MAP_HTML.replace('__TOP_N__', str(DEFAULT_TOP_N)), mimetype='text/html')
+
+    @server.route('/network/routes.json')
+    def network_routes():
+        if not data_loader.is_ready():
+            return Response('{"error": "data is still loading"}', status=503, mimetype='application/json')
+
+        top_n = min(request.args.get('top_n', DEFAULT_TOP_N, type=int), MAX_TOP_N)
+        min_passengers = request.args.get('min_passengers', 0, type=int)
+        payload = network_payload(top_n, min_passengers)
+
+        response = Response(payload, mimetype='application/json')
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        return response
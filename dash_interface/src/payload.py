@@ -0,0 +1,165 @@
+# src/payload.py
+
+import os
+import re
+import gzip
+import json
+import base64
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+from dash import Dash
+from flask import request
+
+# traces longer than this are downsampled (largest-triangle-three-buckets); 0 disables
+MAX_POINTS = int(os.environ.get('FIGURE_MAX_POINTS', '2000'))
+
+# responses smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_MIMETYPES = ('application/json', 'text/html', 'text/css', 'text/plain',
+                      'application/javascript', 'text/javascript')
+GZIP_LEVEL = 6
+
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+
+# 1. typed-array trace encoding
+
+def _encode(values: np.ndarray) -> dict:
+    """plotly.js typed-array spec: {'dtype': 'f8', 'bdata': <base64 little-endian bytes>}"""
+    values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+    return {'dtype': values.dtype.str.lstrip('<|'), 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def _decode(values):
+    """numpy array for a typed-array spec or a plain list (None for anything else)"""
+    if isinstance(values, dict) and 'bdata' in values:
+        return np.frombuffer(base64.b64decode(values['bdata']), dtype=np.dtype(values['dtype']).newbyteorder('<'))
+    if isinstance(values, list) and values:
+        if all(isinstance(v, str) for v in values[:1]) and _ISO_DATE.match(values[0]):
+            try:
+                return pd.to_datetime(values, format='ISO8601').to_numpy(dtype='datetime64[ms]')
+            except (ValueError, TypeError):
+                return None
+        if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values):
+            return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return None
+
+
+# 2. downsampling
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    indices of the points kept by largest-triangle-three-buckets.
+    the first and last points are kept and each bucket keeps the point forming the
+    largest triangle with its neighbours, which preserves peaks and the visual shape.
+    points with a missing y are always kept so gaps survive.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    gaps = np.flatnonzero(np.isnan(y))
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= threshold:
+        return np.arange(n)
+    vx, vy = x[valid].astype(np.float64), y[valid]
+
+    kept = [0]
+    edges = np.linspace(1, len(valid) - 1, threshold - 1).astype(int)
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else len(valid)
+        avg_x, avg_y = vx[stop:next_stop].mean(), vy[stop:next_stop].mean()
+        ax, ay = vx[kept[-1]], vy[kept[-1]]
+        area = np.abs((ax - avg_x) * (vy[start:stop] - ay) - (ax - vx[start:stop]) * (avg_y - ay))
+        kept.append(start + int(np.argmax(area)))
+    kept.append(len(valid) - 1)
+
+    return np.union1d(valid[kept], gaps)
+
+
+def _downsample(trace: dict, x: np.ndarray, y: np.ndarray, max_points: int):
+    if trace.get('fill') or len(x) != len(y) or len(x) <= max_points:
+        return x, y
+    numeric_x = x.astype('datetime64[ms]').astype(np.float64) if x.dtype.kind == 'M' else x.astype(np.float64)
+    keep = lttb_indices(numeric_x, y.astype(np.float64), max_points)
+    return x[keep], y[keep]
+
+
+# 3. figure payloads
+
+def encode_figure(fig, max_points: int = MAX_POINTS) -> str:
+    """
+    serialize a figure for the browser with every x / y array as a typed array.
+    date axes are sent as epoch milliseconds (float64) with the axis type pinned
+    to 'date', and line traces longer than max_points are downsampled first.
+    returns the JSON text (FigureCache.set() accepts it as is).
+    """
+    figure = json.loads(pio.to_json(fig, validate=False))
+    layout = figure.setdefault('layout', {})
+
+    for trace in figure.get('data', []):
+        x, y = _decode(trace.get('x')), _decode(trace.get('y'))
+        if x is not None and y is not None and y.dtype.kind in 'fiu' and max_points:
+            x, y = _downsample(trace, x, y, max_points)
+
+        for key, values in (('x', x), ('y', y)):
+            if values is None:
+                continue
+            if values.dtype.kind == 'M':
+                axis = (trace.get(f'{key}axis') or key).replace(key, f'{key}axis', 1)
+                layout.setdefault(axis, {})['type'] = 'date'
+                values = values.astype('datetime64[ms]').astype(np.int64).astype(np.float64)
+            trace[key] = _encode(values)
+
+    return json.dumps(figure, separators=(',', ':'))
+
+
+# 4. response compression
+
+def _accepts(encoding: str) -> bool:
+    return encoding in request.headers.get('Accept-Encoding', '').lower()
+
+
+def register_compression(app: Dash):
+    """
+    compress text responses (callback JSON, layout, rendered map html, bundles)
+    with brotli when the optional `brotli` package is installed and the client
+    accepts it, gzip otherwise.
+    """
+    server = app.server
+
+    try:
+        import brotli  # optional dependency
+    except ImportError:
+        brotli = None
+
+    @server.after_request
+    def compress_response(response):
+        if (
+            response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES
+            or (response.is_streamed and not response.direct_passthrough)
+        ):
+            return response
+
+        # static files (e.g. the market map html) are streamed from disk; read them once here
+        response.direct_passthrough = False
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_BYTES:
+            return response
+
+        if brotli is not None and _accepts('br'):
+            response.set_data(brotli.compress(data, quality=5))
+            response.headers['Content-Encoding'] = 'br'
+        elif _accepts('gzip'):
+            response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            return response
+
+        response.headers['Content-Length'] = str(len(response.get_data()))
+        response.vary.add('Accept-Encoding')
+        return response
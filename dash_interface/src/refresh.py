@@ -0,0 +1,72 @@
+# src/refresh.py
+
+import os
+import hmac
+import threading
+from dash import Dash
+from flask import jsonify, request
+from src import data_loader
+
+# seconds between checks for new partitions (0 disables the watcher)
+WATCH_INTERVAL = float(os.environ.get('FLIGHT_WATCH_INTERVAL', '60'))
+
+# POST /admin/refresh is only registered when this is set, and then requires
+# the header "X-Admin-Token: <token>"
+ADMIN_TOKEN = os.environ.get('FLIGHT_ADMIN_TOKEN')
+
+_WATCHER = None
+_STOP = threading.Event()
+
+
+# 1. partition watcher
+
+def _watch(interval: float):
+    while not _STOP.wait(interval):
+        try:
+            data_loader.refresh_data()
+        except Exception as e:
+            # keep serving the current version and retry on the next tick
+            print(f"data refresh failed: {e}")
+
+
+def start_watcher(interval: float = WATCH_INTERVAL):
+    """poll the data directory on a daemon thread and merge new partitions as they land"""
+    global _WATCHER
+
+    if interval <= 0 or (_WATCHER is not None and _WATCHER.is_alive()):
+        return _WATCHER
+    _STOP.clear()
+    _WATCHER = threading.Thread(target=_watch, args=(interval,), name='data-watcher', daemon=True)
+    _WATCHER.start()
+    return _WATCHER
+
+
+def stop_watcher():
+    _STOP.set()
+
+
+# 2. admin trigger
+
+def register_refresh_routes(app: Dash):
+    """
+    POST /admin/refresh runs a refresh right away and reports what changed.
+    a refresh can rescan the whole dataset, so without FLIGHT_ADMIN_TOKEN the
+    route does not exist (the watcher still picks up new partitions).
+    """
+    if not ADMIN_TOKEN:
+        return
+
+    server = app.server
+
+    @server.route('/admin/refresh', methods=['POST'])
+    def admin_refresh():
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+            return jsonify(error='forbidden'), 403
+        if not data_loader.is_ready():
+            return jsonify(data_loader.load_status()), 503
+
+        try:
+            result = data_loader.refresh_data()
+        except Exception as e:
+            return jsonify(status='failed', error=str(e), version=data_loader.DATA_VERSION), 500
+        return jsonify(result)
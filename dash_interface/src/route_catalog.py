@@ -0,0 +1,198 @@
+# src/route_catalog.py
+
+import os
+import re
+import bisect
+import threading
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from src import data_loader, aggregates
+from src.aggregates import PASSENGER_SUM
+from src.network_map import load_airport_table
+
+# options returned per search; the dropdown never receives the whole catalog
+SEARCH_LIMIT = int(os.environ.get('ROUTE_SEARCH_LIMIT', '20'))
+
+_SEPARATORS = re.compile(r'[\s\-–→>/]+')
+
+_CATALOG = None
+_CATALOG_VERSION = None
+_LOCK = threading.Lock()
+
+
+def _route_key(text: str) -> str:
+    """'lax las', 'LAX → LAS' and 'lax-las' all become 'lax-las'"""
+    return _SEPARATORS.sub('-', text.strip().lower()).strip('-')
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class RouteCatalog:
+    """
+    every directed route in the data, ranked by passenger volume (id 0 is the busiest).
+
+    two indexes answer the dropdown search without scanning the catalog:
+      - a sorted prefix list over 'origin-dest' and 'dest-origin' keys, so 'LAX'
+        or 'LAX-L' is a bisect and matches the airport at either end;
+      - trigram postings over each route's search text (codes plus airport names),
+        intersected smallest-first for substring queries such as 'vegas'.
+    posting lists hold ids in rank order, so matches come out busiest first.
+    """
+
+    def __init__(self, origins, dests, passengers, airport_names: dict = None):
+        airport_names = airport_names or {}
+        self.routes = [f"{origin}-{dest}" for origin, dest in zip(origins, dests)]
+        self._ids = {route: i for i, route in enumerate(self.routes)}
+        self.passengers = np.asarray(passengers, dtype=np.int64)
+        self.search_text = [
+            f"{origin}-{dest} {origin} {dest} {airport_names.get(origin, '')} {airport_names.get(dest, '')}".lower().strip()
+            for origin, dest in zip(origins, dests)
+        ]
+
+        prefix = sorted(
+            [(route.lower(), i) for i, route in enumerate(self.routes)]
+            + [(f"{dest}-{origin}".lower(), i) for i, (origin, dest) in enumerate(zip(origins, dests))]
+        )
+        self._prefix_keys = [key for key, _ in prefix]
+        self._prefix_ids = np.array([i for _, i in prefix], dtype=np.int64)
+
+        postings = defaultdict(list)
+        for i, text in enumerate(self.search_text):
+            for gram in _trigrams(text):
+                postings[gram].append(i)
+        self._trigrams = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    # 1. construction
+
+    @classmethod
+    def from_cube(cls, cube: pd.DataFrame, airports: pd.DataFrame = None):
+        """rank the routes of a quarterly cube by their whole-history passengers"""
+        totals = cube.groupby(level=['Origin', 'Dest'], observed=True)[PASSENGER_SUM].sum()
+        totals = totals.sort_values(ascending=False, kind='stable').reset_index()
+        names = airports['name'].to_dict() if airports is not None else {}
+        return cls(totals['Origin'].astype(str), totals['Dest'].astype(str), totals[PASSENGER_SUM], names)
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __contains__(self, route) -> bool:
+        return route in self._ids
+
+    # 2. search
+
+    def _prefix_matches(self, key: str) -> np.ndarray:
+        lo = bisect.bisect_left(self._prefix_keys, key)
+        hi = bisect.bisect_left(self._prefix_keys, key + '\uffff')
+        return np.unique(self._prefix_ids[lo:hi])
+
+    def _substring_matches(self, text: str) -> np.ndarray:
+        grams = sorted(_trigrams(text), key=lambda gram: len(self._trigrams.get(gram, ())))
+        if not grams:
+            return np.empty(0, dtype=np.int64)
+        ids = self._trigrams.get(grams[0], np.empty(0, dtype=np.int64))
+        for gram in grams[1:]:
+            if not len(ids):
+                break
+            ids = np.intersect1d(ids, self._trigrams.get(gram, ()), assume_unique=True)
+        # trigram hits are candidates; confirm the full substring
+        return np.array([i for i in ids if text in self.search_text[i]], dtype=np.int64)
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list:
+        """ids of the best matches: route / airport-code prefixes first, then substrings, each busiest first"""
+        if not query or not query.strip():
+            return list(range(min(limit, len(self))))
+
+        matches = list(self._prefix_matches(_route_key(query))[:limit])
+        text = ' '.join(query.lower().split())
+        if len(matches) < limit and len(text) >= 3:
+            seen = set(matches)
+            extra = [i for i in self._substring_matches(text) if i not in seen]
+            matches += extra[:limit - len(matches)]
+        return [int(i) for i in matches]
+
+    def option(self, i: int) -> dict:
+        origin, dest = self.routes[i].split('-')
+        return {"label": f"{origin} - {dest}", "value": self.routes[i], "search": self.search_text[i]}
+
+
+# 3. catalog for the loaded data version
+
+def get_catalog() -> RouteCatalog:
+    """catalog of the current data version, built once per version"""
+    global _CATALOG, _CATALOG_VERSION
+
+    with _LOCK:
+        if _CATALOG_VERSION != data_loader.DATA_VERSION:
+            _CATALOG = RouteCatalog.from_cube(data_loader.QUARTERLY_CUBE, load_airport_table())
+            _CATALOG_VERSION = data_loader.DATA_VERSION
+            print(f"route catalog built: {len(_CATALOG)} routes.")
+        return _CATALOG
+
+
+def route_options(search_value: str = None, selected=None, limit: int = SEARCH_LIMIT) -> list:
+    """
+    dropdown options for a search: at most `limit` matches, plus the selected
+    route(s) (one value, or a list for multi-select) so the dropdown can keep displaying them.
+    """
+    catalog = get_catalog()
+    options = [catalog.option(i) for i in catalog.search(search_value, limit)]
+
+    selected = [selected] if isinstance(selected, str) else list(selected or [])
+    shown = {option['value'] for option in options}
+    for route in reversed([route for route in selected if route and route not in shown]):
+        origin, dest = route.split('-', 1)
+        options.insert(0, {"label": f"{origin} - {dest}", "value": route})
+    return options
+
+
+# 4. airport / carrier options for the drilldowns
+
+_RANKINGS = {}  # (name, data version) -> keys ranked by passengers
+
+
+def _ranked(name: str, cube: pd.DataFrame) -> list:
+    key = (name, data_loader.DATA_VERSION)
+    with _LOCK:
+        if key not in _RANKINGS:
+            if any(version != key[1] for _, version in _RANKINGS):
+                _RANKINGS.clear()
+            _RANKINGS[key] = [str(value) for value in aggregates.ranked_keys(cube).index]
+        return _RANKINGS[key]
+
+
+def _key_options(keys: list, labels: dict, search_value: str, selected, limit: int) -> list:
+    """busiest keys whose code or label contains the search text, plus the selected key"""
+    text = (search_value or '').strip().lower()
+    matches = [key for key in keys if not text or text in key.lower() or text in labels.get(key, '').lower()]
+    options = [{"label": labels.get(key, key), "value": key} for key in matches[:limit]]
+    if selected and selected not in {option['value'] for option in options}:
+        options.insert(0, {"label": labels.get(selected, selected), "value": selected})
+    return options
+
+
+def airport_codes() -> list:
+    """airports of the loaded data, busiest first"""
+    return _ranked('airport', data_loader.AIRPORT_CUBE)
+
+
+def carrier_codes() -> list:
+    """carriers of the loaded data, busiest first"""
+    return _ranked('carrier', data_loader.CARRIER_CUBE)
+
+
+def airport_options(search_value: str = None, selected: str = None, limit: int = SEARCH_LIMIT) -> list:
+    """airports ranked by passengers through them, searchable by code or name"""
+    airports = load_airport_table()
+    names = airports['name'].to_dict() if airports is not None else {}
+    keys = airport_codes()
+    labels = {key: f"{key} - {names[key]}" if key in names else key for key in keys}
+    return _key_options(keys, labels, search_value, selected, limit)
+
+
+def carrier_options(search_value: str = None, selected: str = None, limit: int = SEARCH_LIMIT) -> list:
+    """carriers ranked by passengers"""
+    keys = carrier_codes()
+    return _key_options(keys, {}, search_value, selected, limit)
@@ -0,0 +1,116 @@
+# src/shared_store.py
+
+import os
+import glob
+import fcntl
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# memory-mapped Arrow IPC files shared by every worker process on the host
+SHARED_DIR = os.environ.get(
+    'FLIGHT_SHARED_DIR',
+    os.path.join(tempfile.gettempdir(), 'flight_dashboard'),
+)
+
+
+def _path(version: str, name: str) -> str:
+    return os.path.join(SHARED_DIR, f"{name}_{version}.arrow")
+
+
+# 1. coordination between workers
+
+@contextmanager
+def build_lock(version: str):
+    """
+    exclusive, host-wide lock for one data version.
+    the first worker to take it materializes the files, the others block here
+    and then find the files already published.
+    """
+    os.makedirs(SHARED_DIR, exist_ok=True)
+    with open(os.path.join(SHARED_DIR, f"build_{version}.lock"), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# 2. publish / attach
+
+def publish(version: str, frames: dict):
+    """
+    write each DataFrame in frames as an uncompressed Arrow IPC file.
+    files are written under a temporary name and renamed, so readers never see
+    a partial file; files of older versions are removed.
+    """
+    os.makedirs(SHARED_DIR, exist_ok=True)
+
+    for name, df in frames.items():
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = f"{_path(version, name)}.tmp{os.getpid()}"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, _path(version, name))
+
+    for path in glob.glob(os.path.join(SHARED_DIR, '*')):
+        base = os.path.basename(path)
+        if f"_{version}." not in base and (base.endswith('.arrow') or base.endswith('.lock')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # still mapped by a worker on the old version
+
+
+def _mapped_range(table: pa.Table):
+    """(start, end) addresses spanned by the buffers of a memory-mapped table"""
+    buffers = [buf for column in table.columns for chunk in column.chunks for buf in chunk.buffers() if buf is not None]
+    if not buffers:
+        return 0, 0
+    return min(buf.address for buf in buffers), max(buf.address + buf.size for buf in buffers)
+
+
+def copied_columns(df: pd.DataFrame, table: pa.Table):
+    """numeric / datetime columns of df whose values are not inside table's mapped pages"""
+    start, end = _mapped_range(table)
+    copied = []
+    for col in df.columns:
+        if df[col].dtype.kind not in 'biufM':
+            continue
+        address = np.asarray(df[col]).__array_interface__['data'][0]
+        if not start <= address < end:
+            copied.append(col)
+    return copied
+
+
+def attach(version: str, names, index: dict = None):
+    """
+    memory-map the published files for version and return {name: DataFrame},
+    or None when any of them is missing. index maps a name to the columns it is
+    indexed by.
+    numeric and datetime columns without nulls are zero-copy views of the shared
+    pages; dictionary (categorical) columns only copy their small code arrays.
+    set_index runs with copy-on-write, which keeps the value columns as views (it
+    would copy every column otherwise); a frame that ends up with private copies
+    is reported.
+    """
+    if not all(os.path.exists(_path(version, name)) for name in names):
+        return None
+
+    index = index or {}
+    frames = {}
+    for name in names:
+        source = pa.memory_map(_path(version, name), 'r')
+        table = pa.ipc.open_file(source).read_all()
+        df = table.to_pandas(split_blocks=True)
+        if index.get(name) and not df.empty:
+            with pd.option_context('mode.copy_on_write', True):
+                df = df.set_index(index[name])
+        copied = copied_columns(df, table)
+        if copied:
+            print(f"warning: shared frame {name} holds private copies of {copied}.")
+        frames[name] = df
+    return frames
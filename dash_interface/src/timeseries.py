@@ -0,0 +1,156 @@
+# src/timeseries.py
+
+import numpy as np
+import pandas as pd
+from src.aggregates import (
+    FARE_SUM, FARE_COUNT, FARE_MEAN, PASSENGER_SUM, ROW_COUNT, PERIOD_COL,
+    FARE_BIN_WIDTH, FARE_BINS, BIN_COL, BIN_COUNT, BIN_MAX,
+)
+
+# time series are read from the pre-bucketed cubes, never from raw rows:
+# 'M' from the monthly cube, 'Q' and 'Y' from the quarterly cube.
+# labels follow the cubes: month-end dates for 'M', first day of the period otherwise.
+GRANULARITIES = {'M': 'monthly', 'Q': 'quarterly', 'Y': 'yearly'}
+PERIOD_NAMES = {'M': 'month', 'Q': 'quarter', 'Y': 'year'}
+PERIODS_PER_YEAR = {'M': 12, 'Q': 4, 'Y': 1}
+
+# columns that add up when cells are merged into a coarser period
+ADDITIVE_COLS = [FARE_SUM, FARE_COUNT, PASSENGER_SUM, ROW_COUNT]
+
+# default rolling window per granularity (one year, three years for 'Y')
+ROLLING_WINDOWS = {'M': 12, 'Q': 4, 'Y': 3}
+
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+# 1. period labels
+
+def period_labels(periods, granularity: str) -> pd.Series:
+    """relabel cube period dates to the period of the given granularity"""
+    periods = pd.to_datetime(pd.Series(periods))
+    if granularity == 'M':
+        return periods.dt.to_period('M').dt.to_timestamp(how='end').dt.normalize()
+    if granularity in ('Q', 'Y'):
+        return periods.dt.to_period(granularity).dt.to_timestamp(how='start')
+    raise ValueError(f"unsupported granularity: {granularity}")
+
+
+def period_range(start, end, granularity: str) -> pd.DatetimeIndex:
+    """every period label from start to end (inclusive)"""
+    periods = pd.period_range(start, end, freq=granularity)
+    if granularity == 'M':
+        return periods.to_timestamp(how='end').normalize()
+    return periods.to_timestamp(how='start')
+
+
+# 2. rollups
+
+def rollup(cells: pd.DataFrame, granularity: str, by=(), complete: bool = True) -> pd.DataFrame:
+    """
+    sum the additive columns of cube cells into periods of `granularity`
+    (optionally per `by` group, e.g. ['Origin', 'Dest']), recompute FareMean and
+    complete every group's period range: empty periods get zero counts and a
+    missing (NaN) mean, so later rolling / YoY shifts line up.
+    complete=False keeps only the periods with cells (one vectorized groupby,
+    for bulk exports over many groups).
+    """
+    by = list(by)
+    columns = [col for col in ADDITIVE_COLS if col in cells.columns]
+    if cells.empty:
+        return pd.DataFrame(columns=by + [PERIOD_COL] + columns)
+
+    keyed = cells[by + columns].copy()
+    keyed[PERIOD_COL] = period_labels(cells[PERIOD_COL], granularity).to_numpy()
+    grouped = keyed.groupby(by + [PERIOD_COL], sort=True, observed=True)[columns].sum()
+
+    if not complete:
+        series = grouped.reset_index()
+        if FARE_SUM in series.columns:
+            series[FARE_MEAN] = series[FARE_SUM] / series[FARE_COUNT].where(series[FARE_COUNT] > 0)
+        return series
+
+    frames = []
+    for key, group in (grouped.groupby(level=by, sort=False, observed=True) if by else [((), grouped)]):
+        periods = group.index.get_level_values(PERIOD_COL)
+        full = period_range(periods.min(), periods.max(), granularity)
+        group = group.droplevel(by) if by else group
+        group = group.reindex(full, fill_value=0).rename_axis(PERIOD_COL).reset_index()
+        for col, value in zip(by, key if isinstance(key, tuple) else (key,)):
+            group.insert(by.index(col), col, value)
+        frames.append(group)
+
+    series = pd.concat(frames, ignore_index=True)
+    if FARE_SUM in series.columns:
+        series[FARE_MEAN] = series[FARE_SUM] / series[FARE_COUNT].where(series[FARE_COUNT] > 0)
+    return series
+
+
+# 3. rolling statistics (on a completed rollup)
+
+def rolling_mean(series: pd.DataFrame, col: str, window: int, by=()) -> pd.Series:
+    """trailing mean over `window` periods; missing periods are skipped, not zero"""
+    min_periods = max(1, window // 2)
+    if not by:
+        return series[col].rolling(window, min_periods=min_periods).mean()
+    return series.groupby(list(by), sort=False, observed=True)[col].transform(
+        lambda values: values.rolling(window, min_periods=min_periods).mean()
+    )
+
+
+def yoy_change(series: pd.DataFrame, col: str, granularity: str, by=()) -> pd.Series:
+    """relative change against the same period one year earlier (NaN without a base)"""
+    lag = PERIODS_PER_YEAR[granularity]
+    values = series[col].astype(np.float64)
+    previous = values.shift(lag) if not by else series.groupby(list(by), sort=False, observed=True)[col].shift(lag)
+    previous = previous.astype(np.float64)
+    return (values - previous) / previous.where(previous != 0)
+
+
+# 4. percentiles from the mergeable fare histograms
+
+def histogram_percentiles(hist_cells: pd.DataFrame, granularity: str,
+                          quantiles=DEFAULT_QUANTILES, by=()) -> pd.DataFrame:
+    """
+    fare quantiles per period (optionally per `by` group, e.g. ['Origin', 'Dest'])
+    from quarterly histogram cells (Period, Bin, Count, Max).
+    histograms of the same period are summed, then each quantile is interpolated
+    linearly inside the bin where the cumulative count crosses it, so the error is
+    at most one bin width. the open-ended overflow bin is interpolated up to its
+    largest fare instead. 'M' is not available (histograms are quarterly).
+    works on the sparse cells directly (one cumulative sum and a binary search per
+    quantile), so it scales to every route at once.
+    returns the `by` columns, Period and one column per quantile (e.g. 'p50').
+    """
+    by = list(by)
+    columns = [f"p{round(q * 100):g}" for q in quantiles]
+    if hist_cells.empty or granularity == 'M':
+        return pd.DataFrame(columns=by + [PERIOD_COL] + columns)
+
+    keyed = hist_cells[by + [BIN_COL, BIN_COUNT, BIN_MAX]].copy()
+    keyed[PERIOD_COL] = period_labels(hist_cells[PERIOD_COL], granularity).to_numpy()
+    cells = keyed.groupby(by + [PERIOD_COL, BIN_COL], sort=True, observed=True).agg(
+        {BIN_COUNT: 'sum', BIN_MAX: 'max'})
+    cells = cells[cells[BIN_COUNT] > 0]
+    counts = cells[BIN_COUNT]
+
+    # one running count over all cells; each (group, period) histogram is a contiguous run
+    bins = counts.index.get_level_values(BIN_COL).to_numpy(dtype=np.float64)
+    values = counts.to_numpy(dtype=np.float64)
+    lower = bins * FARE_BIN_WIDTH
+    upper = np.where(bins >= FARE_BINS, np.maximum(cells[BIN_MAX].to_numpy(dtype=np.float64), lower),
+                     lower + FARE_BIN_WIDTH)
+    cumulative = values.cumsum()
+    groups = counts.index.droplevel(BIN_COL)
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ends = np.r_[starts[1:], len(values)]
+    base = np.where(starts > 0, cumulative[starts - 1], 0.0)
+    totals = cumulative[ends - 1] - base
+
+    result = groups[starts].to_frame(index=False)
+    for col, q in zip(columns, quantiles):
+        target = base + q * totals
+        crossing = np.minimum(np.searchsorted(cumulative, target, side='left'), ends - 1)
+        before = cumulative[crossing] - values[crossing]
+        fraction = (target - before) / values[crossing]
+        result[col] = lower[crossing] + fraction * (upper[crossing] - lower[crossing])
+    return result
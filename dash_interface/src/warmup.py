@@ -0,0 +1,218 @@
+# src/warmup.py
+
+import os
+import glob
+import json
+import time
+import fcntl
+import atexit
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from src import data_loader, payload, route_catalog
+from src.figure_cache import FIGURE_CACHE
+from src.folium_map_generator import get_market_map
+
+# after every data load the figures of the top-K routes (and the market map) are
+# built in the background, so the first user after a deploy or refresh gets a cache hit.
+# FLIGHT_WARMUP_TOP_K=0 disables it.
+WARMUP_TOP_K = int(os.environ.get('FLIGHT_WARMUP_TOP_K', '20'))
+WARMUP_THREADS = int(os.environ.get('FLIGHT_WARMUP_THREADS', '4'))
+
+# 'requests': the most requested (analysis, route) pairs recorded by earlier runs,
+# topped up with the busiest routes; 'passengers': the busiest routes only
+WARMUP_RANKING = os.environ.get('FLIGHT_WARMUP_RANKING', 'requests')
+
+# analyses warmed for the busiest routes (any cached analysis can come from the request log)
+WARMUP_ANALYSES = os.environ.get('FLIGHT_WARMUP_ANALYSES', 'fare-trend,volume-trend').split(',')
+
+# request counts survive restarts here (shared by every worker on the host)
+WARMUP_DIR = os.environ.get('FLIGHT_WARMUP_DIR', os.path.join(tempfile.gettempdir(), 'flight_dashboard', 'warmup'))
+FLUSH_EVERY = 50  # recorded requests between two writes of the request log
+LOG_MAX_KEYS = 1000  # the request log keeps only the most requested (analysis, key) pairs
+
+# figure builders by analysis type; keys and payloads match callbacks.render_analysis
+FIGURE_BUILDERS = {
+    'fare-trend': data_loader.generate_fare_trend_plot,
+    'volume-trend': data_loader.generate_passenger_volume_plot,
+    'price-forecast': data_loader.generate_price_forecast_plot,
+    'fare-distribution': data_loader.generate_fare_distribution_plot,
+    'airport-hub': data_loader.generate_airport_hub_plot,
+    'carrier-drilldown': data_loader.generate_carrier_plot,
+}
+
+_PENDING = Counter()  # requests recorded since the last flush
+_PENDING_LOCK = threading.Lock()
+_STATUS_LOCK = threading.Lock()
+_STATUS = {'state': 'idle', 'version': None, 'figures': 0, 'built': 0, 'failed': 0, 'seconds': None}
+
+
+# 1. request log
+
+def _log_path() -> str:
+    return os.path.join(WARMUP_DIR, 'requests.json')
+
+
+def _read_log() -> Counter:
+    try:
+        with open(_log_path(), encoding='utf-8') as f:
+            return Counter({tuple(key.split('|', 1)): count for key, count in json.load(f).items()})
+    except (OSError, ValueError):
+        return Counter()
+
+
+def _known_key(analysis_type: str, key: str) -> bool:
+    """True when key is a route (or airport / carrier, for the drilldowns) of the loaded data"""
+    if analysis_type == 'airport-hub':
+        return key in route_catalog.airport_codes()
+    if analysis_type == 'carrier-drilldown':
+        return key in route_catalog.carrier_codes()
+    return key in route_catalog.get_catalog()
+
+
+def record_request(analysis_type: str, route: str):
+    """
+    count one request for a cacheable (analysis, route) figure. the route comes
+    from the client, so only keys of the loaded data are counted.
+    """
+    if analysis_type not in FIGURE_BUILDERS or not route or WARMUP_TOP_K <= 0 or not data_loader.is_ready():
+        return
+    if not _known_key(analysis_type, route):
+        return
+    with _PENDING_LOCK:
+        _PENDING[(analysis_type, route)] += 1
+        due = sum(_PENDING.values()) >= FLUSH_EVERY
+    if due:
+        flush_requests()
+
+
+def flush_requests():
+    """
+    add the pending counts to the request log (under a host-wide lock, workers merge).
+    only the LOG_MAX_KEYS most requested pairs are kept.
+    """
+    with _PENDING_LOCK:
+        pending = _PENDING.copy()
+        _PENDING.clear()
+    if not pending:
+        return
+
+    try:
+        os.makedirs(WARMUP_DIR, exist_ok=True)
+        with open(os.path.join(WARMUP_DIR, 'requests.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            counts = dict((_read_log() + pending).most_common(LOG_MAX_KEYS))
+            tmp_path = f"{_log_path()}.tmp{os.getpid()}"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'|'.join(key): count for key, count in counts.items()}, f)
+            os.replace(tmp_path, _log_path())
+    except OSError as e:
+        print(f"request log not written: {e}")
+
+
+# 2. what to warm
+
+def warmup_targets(k: int = WARMUP_TOP_K) -> list:
+    """(analysis type, key) pairs to prebuild, most valuable first, at most k"""
+    targets = []
+    if WARMUP_RANKING == 'requests':
+        targets = [key for key, _ in _read_log().most_common() if key[0] in FIGURE_BUILDERS][:k]
+
+    catalog = route_catalog.get_catalog()
+    for route in catalog.routes[:k]:
+        if len(targets) >= k:
+            break
+        targets += [(analysis_type, route) for analysis_type in WARMUP_ANALYSES
+                    if analysis_type in FIGURE_BUILDERS and (analysis_type, route) not in targets]
+    return targets[:k]
+
+
+# 3. warm-up run
+
+def _warm_figure(analysis_type: str, key: str, version: str) -> bool:
+    """build one figure into FIGURE_CACHE unless it is already there (False when it was)"""
+    cache_key = FIGURE_CACHE.make_key(analysis_type, key, version)
+    if FIGURE_CACHE.contains(cache_key):
+        return False
+    FIGURE_CACHE.set(cache_key, payload.encode_figure(FIGURE_BUILDERS[analysis_type](key)))
+    return True
+
+
+def _remove_old_locks(version: str):
+    """
+    delete the warm-up lock files of superseded data versions. a file is only
+    removed while we hold its lock, so a worker still warming that version keeps
+    its mutual exclusion.
+    """
+    for path in glob.glob(os.path.join(WARMUP_DIR, 'warmup_*.lock')):
+        if os.path.basename(path) == f"warmup_{version}.lock":
+            continue
+        try:
+            with open(path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.remove(path)
+        except (BlockingIOError, FileNotFoundError):
+            pass  # still in use, or removed by another worker
+
+
+def run_warmup(version: str, k: int = WARMUP_TOP_K, threads: int = WARMUP_THREADS) -> dict:
+    """
+    prebuild the market map and the top-k figures of `version` on a thread pool.
+    with a shared cache backend (or the map files on disk) one worker per host does
+    the work and the others find the results; otherwise every worker warms its own cache.
+    """
+    os.makedirs(WARMUP_DIR, exist_ok=True)
+    with open(os.path.join(WARMUP_DIR, f"warmup_{version}.lock"), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if FIGURE_CACHE.backend is not None:
+                _STATUS.update(state='skipped', version=version)
+                print(f"warm-up for {version} already running in another worker.")
+                return dict(_STATUS)
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        _remove_old_locks(version)
+        start = time.perf_counter()
+        targets = warmup_targets(k)
+        _STATUS.update(state='running', version=version, figures=len(targets), built=0, failed=0, seconds=None)
+
+        def warm(target):
+            if data_loader.DATA_VERSION != version:
+                return  # a newer version was swapped in; its own warm-up takes over
+            try:
+                if target == ('market-map', None):
+                    get_market_map()
+                elif _warm_figure(*target, version):
+                    with _STATUS_LOCK:
+                        _STATUS['built'] += 1
+            except Exception as e:
+                with _STATUS_LOCK:
+                    _STATUS['failed'] += 1
+                print(f"warm-up of {target} failed: {e}")
+
+        with ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix='warmup') as pool:
+            list(pool.map(warm, [('market-map', None)] + targets))
+
+        _STATUS.update(state='done', seconds=round(time.perf_counter() - start, 3))
+        print(f"warm-up for {version}: {_STATUS['built']} of {len(targets)} figures built, "
+              f"{_STATUS['failed']} failed, map ready, {_STATUS['seconds']}s.")
+        return dict(_STATUS)
+
+
+def _start(version: str):
+    threading.Thread(target=run_warmup, args=(version,), name='cache-warmup', daemon=True).start()
+
+
+def enable_warmup():
+    """warm the caches after every data load / refresh and keep the request log on exit"""
+    if WARMUP_TOP_K <= 0:
+        return
+    data_loader.add_install_listener(_start)
+    atexit.register(flush_requests)
+
+
+def warmup_status() -> dict:
+    with _STATUS_LOCK:
+        return dict(_STATUS)
@@ -0,0 +1,13 @@
+# wsgi.py
+#
+# production entry point (debug off, no reloader):
+#
+#   cd dash_interface && gunicorn -c gunicorn.conf.py wsgi:server
+#
+# every worker builds its own app and starts its own data load; set
+# FLIGHT_SHARED_MEMORY=1 so the workers on a host share one copy of the dataset.
+
+from main import create_app
+
+app = create_app()
+server = app.server